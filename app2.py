@@ -1,23 +1,77 @@
 import streamlit as st
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_core.output_parsers import JsonOutputParser
-from reportlab.platypus import SimpleDocTemplate, Paragraph
-from reportlab.lib.styles import getSampleStyleSheet
-
-from src.functions import (
-    embedding_model, load_pdf_file, filter_to_minimal_docs, 
-    resume_features_extraction, resume_to_text, jobpost_feature_extraction, job_post_to_text
-)
-from src.utils import clean_text
-from src.prompts import resume_prompt, job_post_prompt, candidate_matching_prompt
-from embed import building_vectordb
 
-from rank_bm25 import BM25Okapi
-import tempfile
+from src import config
+from src.engine import MatchingEngine
+from src.fusion import as_number
+from src.ingestion import uploaded_directory
+from src.metrics import metrics
+from src.ranking import parse_scores
+from src.reports import ReportBuilder, ranking_version, report_file_name
+
 import os
-import shutil
-import base64
-import io
+import time
+
+
+# the pipeline (llm/embedding clients, vector store, bm25 index) is created once per backend
+# and shared by every session and rerun, so a click only pays for its own llm calls
+@st.cache_resource
+def get_engine(backend):
+    return MatchingEngine(backend=backend)
+
+# resumes dropped in the watched folder are indexed in the background by one watcher per folder,
+# feeding the engine of the configured backend: switching backends in the sidebar never starts a second one
+@st.cache_resource
+def get_watcher(directory):
+    return get_engine(config.VECTOR_BACKEND).watch(directory)
+
+# candidate pdf reports, built in the background and cached across reruns and sessions
+@st.cache_resource
+def get_report_builder():
+    return ReportBuilder()
+
+# body of a candidate card, also used for the partial evaluations while the ranking streams in
+def show_evaluation(record):
+    st.progress(min(max(as_number(record.get("score")), 0.0), 100.0) / 100)  # convert to 0–1
+    st.markdown(f"**Confidence:** {record.get('confidence') or '...'}")
+    st.markdown("**Strengths**\n" + "".join(f"\n- {s}" for s in record.get("strengths") or []))
+    st.markdown("**Skill Gaps**\n" + "".join(f"\n- {g}" for g in record.get("gaps") or []))
+    st.markdown(record.get("explanation") or "")
+
+# ranked candidate cards with their report downloads: a button per finished report,
+# a disabled placeholder for those still being built, the zip once all of them are done
+def show_ranking(ranking, reports, polling=False):
+    records, version = ranking["records"], ranking["version"]
+    archive = reports.zip(records, version)
+    if archive is None:
+        st.button(f"Preparing reports (ZIP) {reports.done(records, version)}/{len(records)}…",
+                  disabled=True, key="download_all_reports")
+    else:
+        st.download_button(
+            "Download all reports (ZIP)", archive,
+            file_name="candidate_reports.zip", mime="application/zip", key="download_all_reports"
+        )
+
+    # Collapsible Cards 
+    for record in records:
+
+        candidate_name = record["name"]
+
+        with st.expander(f"👤 {candidate_name}  ({record['score']:.0f}%)", expanded=False):
+            show_evaluation(record)
+
+            # Download individuals report button, served from the cached pdf bytes once built
+            pdf = reports.result(record, version)
+            if pdf is None:
+                st.button(f"Building report for {candidate_name}…", disabled=True, key=f"download_btn_{record['id']}")
+            else:
+                st.download_button(
+                    f"Download Report for {candidate_name}", pdf,
+                    file_name=report_file_name(record), mime="application/pdf", key=f"download_btn_{record['id']}"
+                )
+
+    # everything built: one full rerun registers the fragment again without the polling
+    if polling and archive is not None:
+        st.rerun()
 
 # ------------------ UI CONFIGURATION ------------------ 
 
@@ -34,6 +88,18 @@ st.markdown("Intelligent ranking, explainability, and hybrid retrieval in one pl
 st.sidebar.header("Configuration")
 top_k = st.sidebar.slider("Top K Candidates", 1, 10, 5)
 temperature = st.sidebar.slider("LLM Temperature", 0.0, 1.0, 0.7)
+extraction_workers = st.sidebar.slider("Parallel Resume Extractions", 1, 16, config.EXTRACTION_MAX_WORKERS)
+ranking_mode = st.sidebar.selectbox(
+    "Ranking Mode", ["single", "map-reduce"], index=["single", "map-reduce"].index(config.RANKING_MODE),
+    help="map-reduce scores large candidate pools in parallel batches before a final re-rank"
+)
+stream_ranking = st.sidebar.checkbox(
+    "Stream Ranking", value=True, help="show the candidate evaluations while the model writes them (single ranking mode)"
+)
+vector_backend = st.sidebar.selectbox(
+    "Vector Store", ["pinecone", "local"], index=["pinecone", "local"].index(config.VECTOR_BACKEND)
+)
+show_metrics = st.sidebar.checkbox("Show Pipeline Metrics", value=False)
 
 
 # ------------------ INPUT AREA -------------------------- 
@@ -65,34 +131,27 @@ if run_btn:
         st.error("Please upload resumes and enter a job description.")
         st.stop()
 
-    with st.spinner("Processing resumes..."):
-
-        # Setting up the LLM
-        llm = ChatGoogleGenerativeAI(
-            model="gemini-2.5-flash",
-            temperature=temperature,
-            google_api_key=os.environ["GEMINI_API_KEY"]
-        ) 
-        parser = JsonOutputParser() # for structured json response
-
-        # creating a temporary directory as load_pdf_file fn expects a directory containing resumes
-        temp_dir = tempfile.mkdtemp()
-        for uploaded_file in uploaded_files:
-            file_path = os.path.join(temp_dir, uploaded_file.name)
-            with open(file_path, "wb") as f:
-                f.write(uploaded_file.read())
-
-        extracted_resume = load_pdf_file(temp_dir)
-        filtered_resume = filter_to_minimal_docs(extracted_resume)
-        resume_extraction = resume_features_extraction(
-            filtered_resume, llm, clean_text, resume_prompt, resume_to_text, parser
-        )
+    engine = get_engine(vector_backend)
+    if config.INGEST_WATCH_DIR:
+        get_watcher(config.INGEST_WATCH_DIR)
+    stats_before = engine.extraction_cache.stats()
+    run_start = time.perf_counter()
+
+    # per-file progress, updated as each resume extraction completes
+    extraction_bar = st.progress(0.0, text="Processing resumes...")
 
-        doc_search = building_vectordb(resume_extraction,embedding_model)
+    def show_extraction_progress(done, total, doc):
+        extraction_bar.progress(done / total, text=f"Extracted {done}/{total} resumes ({os.path.basename(doc.metadata['source'])})")
 
-        job_description_doc = jobpost_feature_extraction(
-            job_description_input, llm, clean_text, job_post_prompt, job_post_to_text, parser
+    # a temporary directory of the uploads, removed once ingested; loaded, extracted (resumes already extracted
+    # in earlier runs are served from disk) and indexed INGEST_CHUNK_SIZE files at a time, so memory stays flat
+    with uploaded_directory(uploaded_files) as temp_dir:
+        resume_extraction = engine.ingest_directory(
+            temp_dir, temperature=temperature, max_workers=extraction_workers, progress=show_extraction_progress
         )
+
+    with st.spinner("Processing job description..."):
+        job_description_doc = engine.process_job(job_description_input, temperature)
         job_description = job_description_doc.page_content
 
 
@@ -100,97 +159,96 @@ if run_btn:
 
     with st.spinner("Performing hybrid retrieval..."):
 
-        # Dense Retrievel (Semantic Search)
-        retriever = doc_search.as_retriever(search_type="similarity", search_kwargs={"k": top_k})
-        dense_results = retriever.invoke(job_description)
+        # metadata pre-filter, dense + bm25 search over the uploaded candidates, rank fusion, then a cpu
+        # re-rank of the pool (map-reduce ranking keeps a larger pool as it never sends more than one batch per llm call)
+        unique_docs = engine.shortlist(job_description_doc, resume_extraction, top_k, ranking_mode)
 
-        # Sparse Retrievel (Keyword Search)
-        docs = [doc.page_content for doc in resume_extraction]
-        tokenized_docs = [d.lower().split() for d in docs]
-        bm25 = BM25Okapi(tokenized_docs)
+    retrieval_scores = [{"name": doc.metadata["name"], **doc.metadata["retrieval_scores"]} for doc in unique_docs]
 
-        # Calculating the matching score for each candidate profile as per job description
-        keywords = job_description.lower().split()
-        bm25_scores = bm25.get_scores(keywords)
+    # the retrieved pool is shown right away, while the llm is still ranking it
+    retrieval_area = st.empty()
+    with retrieval_area.container():
+        st.subheader("Retrieved Candidates")
+        st.dataframe(retrieval_scores)
 
-        # Taking the highest score candidate profile
-        top_ids = bm25_scores.argsort()[-top_k:][::-1]
-        sparse_results = [resume_extraction[i] for i in top_ids]
 
-        metadata_filtered = [
-            c for c in resume_extraction
-            if c.metadata["experience"] >= job_description_doc.metadata["experience_required"]
-        ]
+    # Candidate Matching and Ranking using candidate_matching_prompt
 
-        # Combining Retrieval Results from all, by taking intersection using id
-        combined = dense_results + sparse_results + metadata_filtered
-        unique_docs = list({doc.metadata["id"]: doc for doc in combined}.values())
+    if stream_ranking and ranking_mode == "single":
+
+        # evaluations are rendered while the llm writes them, the partial json is re-parsed on every chunk
+        live_area = st.empty()
+        response = {}
+        for response in engine.rank_stream(unique_docs, job_description, temperature):
+            with live_area.container():
+                st.subheader("Ranking candidates using AI...")
+                for entry in response.get("candidates") or []:
+                    if isinstance(entry, dict):
+                        with st.expander(f"👤 {entry.get('name') or entry.get('id') or '...'}", expanded=True):
+                            show_evaluation(entry)
+        live_area.empty()
+        ranked = parse_scores(response, unique_docs)[:top_k]
+
+    else:
+        with st.spinner("Ranking candidates using AI..."):
+            ranked = engine.rank(unique_docs, job_description, ranking_mode, top_k, temperature)
+
+    stats_after = engine.extraction_cache.stats()
+    metrics.observe("pipeline", time.perf_counter() - run_start)
+    extraction_bar.empty()
+    retrieval_area.empty()
+
+    # parsed results are kept in the session, so reruns (e.g. a button click) do not parse or call the llm again
+    st.session_state["ranking"] = {
+        "records": ranked,
+        "version": ranking_version(ranked),
+        "retrieval_scores": retrieval_scores,
+        "cache_stats": {key: stats_after[key] - stats_before[key] for key in ("hits", "misses")},
+    }
 
+    st.success("Candidate ranking completed!")
 
-    # Candidate Matching and Ranking using candidate_matching_prompt
 
-    with st.spinner("Ranking candidates using AI..."):
+# -----------------------------DISPLAYING RESULT ON THE UI------------------------------------
 
-        candidate_context = "\n\n".join(doc.page_content for doc in unique_docs)
-        chain = candidate_matching_prompt | llm
 
-        response_text = chain.invoke({
-            "candidate_context": candidate_context,
-            "job_description": job_description
-        })
+ranking = st.session_state.get("ranking")
 
-    st.success("Candidate ranking completed!")
+if ranking:
 
+    cache_stats = ranking["cache_stats"]
+    st.caption(f"Resume extraction cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses")
 
-    # -----------------------------DISPLAYING RESULT ON THE UI------------------------------------
-
-  
+    with st.expander("Hybrid retrieval scores", expanded=False):
+        st.dataframe(ranking["retrieval_scores"])
 
     st.subheader("Final Ranked Candidates")
-    # st.text(response_text)
 
-    # Assume the LLM output is plain text w/ structured sections
-    # candidates_output = response_text.split("\n\n")
-    response_text_str = response_text.content if hasattr(response_text, "content") else str(response_text)
+    # every report of the shortlist starts building now on the report processes, the cards never wait for them
+    reports = get_report_builder()
+    reports.submit(ranking["records"], ranking["version"])
+    ready = reports.done(ranking["records"], ranking["version"]) == len(ranking["records"])
+    # while reports are being built the cards poll once a second (a fragment rerun, not the whole page)
+    st.fragment(show_ranking, run_every=None if ready else 1)(ranking, reports, polling=not ready)
 
-    candidates_output = response_text_str.split("\n\n")
 
+# ------------------PIPELINE METRICS (optional sidebar panel)------------------------------------
 
-    # Collapsible Cards 
-    for i, candidate_block in enumerate(candidates_output):
-
-        if not candidate_block.strip():
-            continue
-
-        # Extract name for the title
-        first_line = candidate_block.split("\n")[0]
-        candidate_name = first_line.replace("**", "").strip()
-
-        with st.expander(f"👤 {candidate_name}", expanded=False):
-            st.markdown(candidate_block)
-
-        
-            # Extracting score
-            if "Score:" in candidate_block:
-                try:
-                    score_val = float(candidate_block.split("Score:")[1].split("\n")[0].strip())
-                    st.progress(score_val / 100)  # convert to 0–1
-                except:
-                    pass
-
-            # Download individuals report button
-            if st.button(
-            f"Download Report for {candidate_name}",
-            key=f"download_btn_{i}"
-            ):
-                buffer = io.BytesIO()
-                pdf = SimpleDocTemplate(buffer)
-                styles = getSampleStyleSheet()
-                story = [Paragraph(candidate_block.replace("\n", "<br/>"), styles["Normal"])]
-                pdf.build(story)
-
-                encoded_pdf = base64.b64encode(buffer.getvalue()).decode()
-                st.markdown(
-                    f'<a href="data:application/pdf;base64,{encoded_pdf}" download="{candidate_name}_report.pdf">Download PDF</a>',
-                    unsafe_allow_html=True
-                )
+
+# cumulative for the process (every session shares the engine), rendered last so it includes this run
+if show_metrics:
+
+    snapshot = metrics.snapshot()
+
+    with st.sidebar.expander("Pipeline Metrics", expanded=True):
+        st.dataframe([
+            {"stage": name, "calls": stage["count"], "total (s)": round(stage["seconds"], 3),
+             "max (s)": round(stage["max_seconds"], 3)}
+            for name, stage in sorted(snapshot["stages"].items())
+        ])
+        st.dataframe([{"counter": name, "value": value} for name, value in sorted(snapshot["counters"].items())])
+        st.download_button("Download JSON", metrics.to_json(), file_name="metrics.json", mime="application/json")
+        st.download_button("Download Prometheus", metrics.to_prometheus(), file_name="metrics.prom", mime="text/plain")
+        if st.button("Reset Metrics"):
+            metrics.reset()
+            st.rerun()
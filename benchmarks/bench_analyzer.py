@@ -0,0 +1,69 @@
+# quality and speed of the bm25 analyzer vs the old .lower().split() on the bundled resumes
+# usage: python -m benchmarks.bench_analyzer --resumes resumes --repeat 200
+
+import argparse
+import re
+import time
+
+from src.analyzer import Analyzer
+from src.functions import load_pdf_file, job_post_to_text
+from src.sparse import SparseIndex, whitespace_tokenizer
+from src.utils import clean_text
+
+
+SAMPLE_JOB = {
+    "role": "Data Scientist",
+    "company": "Acme",
+    "experience_required": 1,
+    "skills": ["Python", "ML", "NLP", "SQL", "Power BI"],
+    "skill_classification": {"must_have": ["Python", "Machine Learning"], "important": ["SQL"], "nice_to_have": ["Power BI"]},
+    "description": "Build machine learning and natural language processing models.",
+}
+
+LABEL_TOKENS = {"role:", "skills:", "must", "have:", "important:", "nice", "to", "have:", "description:", "company:"}
+PUNCTUATED = re.compile(r"^\W|\W$")
+
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument("--resumes", default="resumes")
+    arg_parser.add_argument("--repeat", type=int, default=200)
+    args = arg_parser.parse_args()
+
+    pages = load_pdf_file(args.resumes)
+    texts = [clean_text(page.page_content) for page in pages]
+    query = job_post_to_text(SAMPLE_JOB)
+    analyzer = Analyzer()
+
+    print(f"{len(pages)} pages from {args.resumes}/")
+    for name, tokenizer in [("whitespace", whitespace_tokenizer), ("analyzer", analyzer)]:
+        tokens = [t for text in texts for t in tokenizer(text)]
+        query_tokens = tokenizer(query)
+        noise = sum(1 for t in query_tokens if t in LABEL_TOKENS or PUNCTUATED.search(t))
+        index = SparseIndex(tokenizer=tokenizer)
+        for i, text in enumerate(texts):
+            index.add(str(i), text)
+        ranking = [pages[int(doc_id)].metadata["source"] for doc_id, _ in index.search(query, k=3)]
+
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            for text in texts:
+                tokenizer(text)
+        elapsed = time.perf_counter() - start
+        print(f"\n[{name}] vocabulary={len(set(tokens))} tokens={len(tokens)} "
+              f"query_terms={len(query_tokens)} noisy_query_terms={noise}")
+        print(f"[{name}] {len(tokens) * args.repeat / elapsed:,.0f} tokens/s")
+        print(f"[{name}] top 3: {ranking}")
+
+    # the analyzer caches per text, so the loop above measures the warm path
+    cold = Analyzer(cache_size=0)
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        for text in texts:
+            cold(text)
+    elapsed = time.perf_counter() - start
+    print(f"\n[analyzer, no cache] {len(texts) * args.repeat / elapsed:,.0f} documents/s")
+
+
+if __name__ == "__main__":
+    main()
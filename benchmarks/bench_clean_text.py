@@ -0,0 +1,87 @@
+# benchmark the single-pass clean_text against the previous placeholder based version, and the batch api
+# usage: python -m benchmarks.bench_clean_text --texts 2000 --matches 5 50 500 --workers 1 4 8
+
+import argparse
+import glob
+import random
+import re
+import time
+
+from src.functions import load_single_pdf
+from src.utils import clean_text, clean_texts
+
+
+# the previous implementation, kept to check that the output did not change
+def clean_text_reference(text):
+    text = re.sub(r'<[^>]*?>', '', text)
+    text = re.sub(
+        r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|'
+        r'(?:%[0-9a-fA-F][0-9a-fA-F]))+',
+        '',
+        text
+    )
+    emails = re.findall(r'[\w\.-]+@[\w\.-]+', text)
+    for i, email in enumerate(emails):
+        text = text.replace(email, f"__EMAIL{i}__")
+    numbers = re.findall(r'\b\d+(?:[\.-]\d+)?(?:\s*-\s*\d+(?:\.\d+)?)?\s*(?:years?|yrs?)\b', text, flags=re.IGNORECASE)
+    for i, num in enumerate(numbers):
+        text = text.replace(num, f"__NUM{i}__")
+    text = re.sub(r'[^a-zA-Z0-9@.\-_\s]', ' ', text)
+    text = re.sub(r'\s{2,}', ' ', text).strip()
+    for i, num in enumerate(numbers):
+        text = text.replace(f"__NUM{i}__", num)
+    for i, email in enumerate(emails):
+        text = text.replace(f"__EMAIL{i}__", email)
+    return text
+
+
+WORDS = ["Python", "SQL", "developer", "built", "pipeline", "(ML)", "•", "–", "data,", "team;", "<b>", "</b>",
+         "https://github.com/example", "analysis!", "models", "&", "AWS", "10%", "résumé"]
+
+
+def synthetic_resume(matches, rng, length=600):
+    # `matches` emails and experience patterns spread over `length` words
+    words = [rng.choice(WORDS) for _ in range(length)]
+    for i in range(matches):
+        pattern = rng.choice([f"user{i}@example.com", f"{i % 15} years", f"{i % 9}.5 yrs", f"{i % 5}-{i % 5 + 3} years"])
+        words.insert(rng.randrange(len(words)), pattern)
+    return " ".join(words)
+
+
+def timed(fn, texts, runs=3):
+    best = float("inf")
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn(texts)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument("--texts", type=int, default=2000)
+    arg_parser.add_argument("--matches", type=int, nargs="+", default=[5, 50, 500], help="emails/years per resume")
+    arg_parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8])
+    args = arg_parser.parse_args()
+
+    # same output on the sample resumes
+    for path in glob.glob("resumes/*.pdf"):
+        text = load_single_pdf(path).page_content
+        assert clean_text(text) == clean_text_reference(text), path
+
+    rng = random.Random(0)
+    for matches in args.matches:
+        texts = [synthetic_resume(matches, rng) for _ in range(args.texts)]
+        assert [clean_text(t) for t in texts[:50]] == [clean_text_reference(t) for t in texts[:50]]
+
+        reference = timed(lambda batch: [clean_text_reference(t) for t in batch], texts)
+        single = timed(lambda batch: [clean_text(t) for t in batch], texts)
+        print(f"matches={matches:<4} reference={len(texts) / reference:8.0f} texts/s  "
+              f"clean_text={len(texts) / single:8.0f} texts/s  speedup={reference / single:.1f}x")
+        for workers in args.workers:
+            batch = timed(lambda batch: clean_texts(batch, max_workers=workers, min_batch=1), texts, runs=1)
+            print(f"             clean_texts workers={workers:<3} {len(texts) / batch:8.0f} texts/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+# end to end offline benchmark of the pipeline with the fake llm and embeddings, no network needed
+# usage: python -m benchmarks.bench_pipeline --sizes 10 100 1000 10000 --llm-latency 0.05 --json results.json
+#
+# stages: load_pdf (load_pdf_file), extraction (resume_features_extraction), vectordb (building_vectordb,
+# local backend), sparse_index (building_sparse_index), job_extraction, retrieval (hybrid) and ranking,
+# plus screening: all the job descriptions shortlisted in one bulk pass (screen_jobs, without ranking),
+# and match_cold / repeat_match: one full match, then the same job description again from the query cache.
+# The batch stages run --repeat times over the whole corpus, the query stages once per query (--queries).
+# Peak memory is measured with tracemalloc in one extra run per stage, so it does not skew the timings
+# (memory of the pdf worker processes is not included).
+
+import argparse
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+import tracemalloc
+
+os.environ.setdefault("GEMINI_API_KEY", "offline-benchmark")  # embed.py builds a client at import, never called
+
+from langchain_core.output_parsers import JsonOutputParser
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.platypus import SimpleDocTemplate, Paragraph
+
+from benchmarks.fake_embeddings import FakeEmbeddings
+from benchmarks.fake_llm import FakeLLM, SKILLS
+from embed import building_vectordb, building_sparse_index
+from src import config
+from src.cache import ExtractionCache, QueryCache
+from src.candidates import CandidateStore
+from src.embeddings import CachedEmbeddings
+from src.engine import MatchingEngine
+from src.functions import load_pdf_file, filter_to_minimal_docs, resume_features_extraction, resume_to_text
+from src.metrics import metrics
+from src.prompts import resume_prompt
+from src.utils import clean_text
+
+
+ROLES = ["Data Scientist", "ML Engineer", "Data Analyst", "Software Engineer", "NLP Engineer"]
+
+
+def write_corpus(directory, n, seed=0):
+    """Synthetic resume pdfs resume_00000.pdf ... in `directory`, files already there are reused."""
+    os.makedirs(directory, exist_ok=True)
+    styles = getSampleStyleSheet()
+    for i in range(n):
+        path = os.path.join(directory, f"resume_{i:05d}.pdf")
+        if os.path.isfile(path):
+            continue
+        rng = random.Random(seed * 1_000_003 + i)
+        lines = [
+            f"Candidate {i}",
+            f"{rng.choice(ROLES)} with {rng.randint(0, 12)} years of experience",
+            "Skills: " + ", ".join(rng.sample(SKILLS, 6)),
+            "Education: B.Tech in Computer Science",
+            *(f"Project {p}: built a {rng.choice(SKILLS)} pipeline for {rng.choice(['retail', 'finance', 'health'])} data"
+              for p in range(3)),
+            "Certifications: " + rng.choice(["AWS Certified Cloud Practitioner", "TensorFlow Developer", "None"]),
+        ]
+        SimpleDocTemplate(path).build([Paragraph(line, styles["Normal"]) for line in lines])
+    return directory
+
+
+def synthetic_jobs(n, seed=0):
+    rng = random.Random(seed)
+    return [f"We are hiring a {rng.choice(ROLES)} with {rng.randint(0, 5)}+ years of experience. "
+            f"Required skills: {', '.join(rng.sample(SKILLS, 4))}." for _ in range(n)]
+
+
+def percentile(samples, q):
+    samples = sorted(samples)
+    index = min(len(samples) - 1, max(0, round(q / 100 * (len(samples) - 1))))
+    return samples[index]
+
+
+def measure(fn, runs, trace_memory=True):
+    """Wall time of `runs` calls of fn, plus the tracemalloc peak of one more call. Returns (times, peak, result)."""
+    times, result = [], None
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    peak = None
+    if trace_memory:
+        tracemalloc.start()
+        fn()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return times, peak, result
+
+
+def report(size, stage, items, times, peak):
+    median = statistics.median(times)
+    row = {
+        "size": size, "stage": stage, "runs": len(times),
+        "p50_s": percentile(times, 50), "p95_s": percentile(times, 95),
+        "throughput_per_s": items / median if median else float("inf"),
+        "peak_mem_mb": peak / 1024 / 1024 if peak is not None else None,
+    }
+    memory = f"{row['peak_mem_mb']:.1f}MB" if peak is not None else "-"
+    print(f"size={size:<6} {stage:<15} runs={len(times):<3} p50={row['p50_s']:.4f}s p95={row['p95_s']:.4f}s "
+          f"throughput={row['throughput_per_s']:.1f}/s peak_mem={memory}")
+    return row
+
+
+def bench_size(size, args, workdir):
+    corpus = write_corpus(os.path.join(args.corpus_dir or workdir, "corpus"), size)
+    # only the first `size` files of the (possibly larger, reused) corpus directory
+    run_dir = os.path.join(workdir, f"resumes_{size}")
+    os.makedirs(run_dir, exist_ok=True)
+    for i in range(size):
+        target = os.path.join(run_dir, f"resume_{i:05d}.pdf")
+        if not os.path.exists(target):
+            os.symlink(os.path.abspath(os.path.join(corpus, f"resume_{i:05d}.pdf")), target)
+
+    config.LOCAL_INDEX_PATH = os.path.join(workdir, f"local_index_{size}")
+    config.QUERY_CACHE_ENABLED = 0  # the query stages measure cold queries, see repeat_match for the cached ones
+    sparse_path = os.path.join(workdir, f"sparse_index_{size}.json")
+    parser = JsonOutputParser()
+    llm = FakeLLM(latency=args.llm_latency, latency_per_1k_chars=args.llm_latency_per_1k)
+    fake_embeddings = FakeEmbeddings(size=args.dim, latency=args.embedding_latency,
+                                     latency_per_text=args.embedding_latency_per_text)
+    trace = not args.no_memory
+    rows = []
+
+    times, peak, docs = measure(lambda: filter_to_minimal_docs(
+        load_pdf_file(run_dir, per_file=True, max_workers=args.pdf_workers)), args.repeat, trace)
+    rows.append(report(size, "load_pdf", size, times, peak))
+
+    times, peak, candidates = measure(lambda: resume_features_extraction(
+        docs, llm, clean_text, resume_prompt, resume_to_text, parser,
+        max_workers=args.workers, requests_per_minute=0), args.repeat, trace)
+    rows.append(report(size, "extraction", size, times, peak))
+
+    # embeddings are not cached here, every run pays for embedding the whole pool
+    def embedding_model():
+        return CachedEmbeddings(fake_embeddings, cache=None, model="fake", max_workers=args.embedding_workers)
+
+    times, peak, vectorstore = measure(lambda: building_vectordb(
+        candidates, embedding_model, mode="rebuild", backend="local"), args.repeat, trace)
+    rows.append(report(size, "vectordb", size, times, peak))
+
+    def sparse_index():
+        if os.path.exists(sparse_path):
+            os.remove(sparse_path)
+        return building_sparse_index(candidates, path=sparse_path)
+
+    times, peak, sparse = measure(sparse_index, args.repeat, trace)
+    rows.append(report(size, "sparse_index", size, times, peak))
+
+    engine = MatchingEngine(
+        backend="local", embeddings=vectorstore.embeddings, vectorstore=vectorstore, sparse_index=sparse,
+        extraction_cache=ExtractionCache(os.path.join(workdir, "extraction.sqlite")), llm=llm,
+        candidate_store=CandidateStore(os.path.join(workdir, f"candidates_{size}.sqlite"))
+    )
+    # query stages: one timed call per job description, memory traced on the first one
+    samples = {"job_extraction": [], "retrieval": [], "ranking": []}
+    peaks = {}
+    for i, job in enumerate(synthetic_jobs(args.queries)):
+        traced = trace and i == 0
+        times, peaks["job_extraction"], job_doc = measure(lambda: engine.process_job(job), 1, traced)
+        samples["job_extraction"] += times
+        times, peaks["retrieval"], pool = measure(
+            lambda: engine.retrieve(job_doc, candidates, top_k=args.top_k), 1, traced)
+        samples["retrieval"] += times
+        times, peaks["ranking"], _ = measure(
+            lambda: engine.rank(pool, job_doc.page_content, top_k=args.top_k), 1, traced)
+        samples["ranking"] += times
+        if i == 0:
+            first_peaks = dict(peaks)
+    for stage, times in samples.items():
+        rows.append(report(size, stage, 1, times, first_peaks[stage]))
+
+    jobs = synthetic_jobs(args.queries)
+    times, peak, _ = measure(lambda: engine.screen_jobs(
+        jobs, candidates, top_k=args.top_k, rank=False, requests_per_minute=0), args.repeat, trace)
+    rows.append(report(size, "screening", len(jobs), times, peak))
+
+    # the same job description again, answered from the query cache
+    engine.query_cache = QueryCache(os.path.join(workdir, f"queries_{size}.sqlite"))
+    times, peak, _ = measure(lambda: engine.match(jobs[0], candidates, top_k=args.top_k), 1, False)
+    rows.append(report(size, "match_cold", 1, times, peak))
+    times, peak, _ = measure(lambda: engine.match(jobs[0], candidates, top_k=args.top_k), args.repeat, trace)
+    rows.append(report(size, "repeat_match", 1, times, peak))
+    return rows
+
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000])
+    arg_parser.add_argument("--repeat", type=int, default=3, help="runs of each batch stage")
+    arg_parser.add_argument("--queries", type=int, default=20, help="job descriptions for the query stages")
+    arg_parser.add_argument("--top-k", type=int, default=5)
+    arg_parser.add_argument("--llm-latency", type=float, default=0.05)
+    arg_parser.add_argument("--llm-latency-per-1k", type=float, default=0.0, help="extra seconds per 1k prompt chars")
+    arg_parser.add_argument("--embedding-latency", type=float, default=0.02, help="seconds per embedding call")
+    arg_parser.add_argument("--embedding-latency-per-text", type=float, default=0.0005)
+    arg_parser.add_argument("--dim", type=int, default=256, help="fake embedding dimension")
+    arg_parser.add_argument("--workers", type=int, default=config.EXTRACTION_MAX_WORKERS)
+    arg_parser.add_argument("--embedding-workers", type=int, default=config.EMBEDDING_MAX_WORKERS)
+    arg_parser.add_argument("--pdf-workers", type=int, default=config.PDF_LOAD_WORKERS)
+    arg_parser.add_argument("--corpus-dir", help="keep the generated pdfs here to reuse them across runs")
+    arg_parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc runs")
+    arg_parser.add_argument("--json", help="write the results (and the pipeline metrics) to this file")
+    args = arg_parser.parse_args()
+
+    rows = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in args.sizes:
+            rows.extend(bench_size(size, args, workdir))
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "results": rows, "metrics": metrics.snapshot()}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
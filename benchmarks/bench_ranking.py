@@ -0,0 +1,51 @@
+# benchmark one ranking call over the whole pool vs map-reduce ranking, against the fake llm
+# usage: python -m benchmarks.bench_ranking --pool 10 100 1000 --latency 0.3 --latency-per-1k 0.05
+
+import argparse
+import time
+
+from langchain_core.documents import Document
+from langchain_core.output_parsers import JsonOutputParser
+
+from benchmarks.fake_llm import FakeLLM
+from src.prompts import candidate_scoring_prompt
+from src.ranking import rank_candidates_map_reduce
+
+
+def synthetic_candidates(n):
+    return [Document(page_content=f"Name: Candidate {i}\nSkills: Python, SQL, Machine Learning\nExperience: {i % 10} years",
+                     metadata={"vector_id": f"c{i}", "name": f"Candidate {i}"}) for i in range(n)]
+
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument("--pool", type=int, nargs="+", default=[10, 100, 1000])
+    arg_parser.add_argument("--latency", type=float, default=0.3)
+    arg_parser.add_argument("--latency-per-1k", type=float, default=0.05, help="extra seconds per 1k prompt chars")
+    arg_parser.add_argument("--batch-size", type=int, default=10)
+    arg_parser.add_argument("--workers", type=int, default=32)
+    args = arg_parser.parse_args()
+
+    parser = JsonOutputParser()
+    job = "Role: Data Scientist\nSkills: Python, Machine Learning"
+    for n in args.pool:
+        candidates = synthetic_candidates(n)
+
+        llm = FakeLLM(latency=args.latency, latency_per_1k_chars=args.latency_per_1k)
+        start = time.perf_counter()
+        rank_candidates_map_reduce(candidates, job, llm, candidate_scoring_prompt, parser,
+                                   batch_size=n, requests_per_minute=0)
+        single = time.perf_counter() - start
+
+        llm = FakeLLM(latency=args.latency, latency_per_1k_chars=args.latency_per_1k)
+        start = time.perf_counter()
+        top = rank_candidates_map_reduce(candidates, job, llm, candidate_scoring_prompt, parser,
+                                         batch_size=args.batch_size, max_workers=args.workers,
+                                         requests_per_minute=0, top_k=5)
+        map_reduce = time.perf_counter() - start
+        print(f"pool={n:<5} single_call={single:.2f}s map_reduce={map_reduce:.2f}s "
+              f"llm_calls={llm.calls} top={[r['name'] for r in top[:3]]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+# benchmark per-query BM25Okapi rebuild (old app behaviour) vs the persistent SparseIndex
+# usage: python -m benchmarks.bench_sparse --docs 1000 10000
+
+import argparse
+import random
+import time
+
+from langchain_core.documents import Document
+from rank_bm25 import BM25Okapi
+
+from src.sparse import SparseIndex
+
+
+def synthetic_corpus(n, vocab_size=5000, length=150, seed=0):
+    rng = random.Random(seed)
+    vocab = [f"term{i}" for i in range(vocab_size)]
+    return [Document(page_content=" ".join(rng.choices(vocab, k=length)), metadata={"vector_id": str(i)})
+            for i in range(n)]
+
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument("--docs", type=int, nargs="+", default=[1000, 10000])
+    arg_parser.add_argument("--queries", type=int, default=20)
+    args = arg_parser.parse_args()
+
+    query = "term1 term42 term777 term4999 term3"
+    for n in args.docs:
+        docs = synthetic_corpus(n)
+
+        start = time.perf_counter()
+        for _ in range(args.queries):
+            bm25 = BM25Okapi([d.page_content.lower().split() for d in docs])
+            bm25.get_scores(query.split()).argsort()[-5:]
+        rebuild = (time.perf_counter() - start) / args.queries
+
+        start = time.perf_counter()
+        index = SparseIndex()
+        index.sync(docs)
+        build = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for _ in range(args.queries):
+            index.search(query, k=5)
+        search = (time.perf_counter() - start) / args.queries
+
+        print(f"docs={n:<6} rebuild_per_query={rebuild * 1000:.1f}ms "
+              f"index_build_once={build * 1000:.1f}ms index_query={search * 1000:.3f}ms")
+
+
+if __name__ == "__main__":
+    main()
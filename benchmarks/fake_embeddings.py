@@ -0,0 +1,48 @@
+# deterministic stand-in for the gemini embedding model so the pipeline can be benchmarked offline
+
+import hashlib
+import re
+import threading
+import time
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+
+TOKEN = re.compile(r"[a-z0-9+#.]+")
+
+
+class FakeEmbeddings(Embeddings):
+    """
+    Hashed bag-of-words vectors of `size` dimensions (unit norm), so texts sharing words get close
+    vectors and retrieval behaves roughly like with a real model. Every call sleeps `latency`
+    seconds plus `latency_per_text` per embedded text.
+    """
+
+    def __init__(self, size=256, latency=0.0, latency_per_text=0.0):
+        self.size = size
+        self.latency = latency
+        self.latency_per_text = latency_per_text
+        self.lock = threading.Lock()
+        self.calls = 0
+
+    def _vector(self, text):
+        vector = np.zeros(self.size, dtype=np.float32)
+        for token in TOKEN.findall(text.lower()):
+            digest = int(hashlib.md5(token.encode("utf-8")).hexdigest(), 16)
+            vector[digest % self.size] += 1.0 if (digest >> 64) & 1 else -1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def _sleep(self, count):
+        with self.lock:
+            self.calls += 1
+        time.sleep(self.latency + self.latency_per_text * count)
+
+    def embed_documents(self, texts):
+        self._sleep(len(texts))
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text):
+        self._sleep(1)
+        return self._vector(text)
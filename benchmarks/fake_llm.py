@@ -0,0 +1,100 @@
+# deterministic stand-in for gemini so the pipeline can be benchmarked offline
+
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.runnables import Runnable
+
+
+SKILLS = ["Python", "SQL", "Machine Learning", "Deep Learning", "NLP", "Pandas", "NumPy", "TensorFlow",
+          "PyTorch", "Docker", "AWS", "Power BI", "Tableau", "Statistics", "Spark", "Excel", "LangChain"]
+
+
+class RateLimitError(Exception):
+    status_code = 429
+
+
+class FakeLLM(Runnable):
+    """
+    Fake chat model returning a resume json derived from a hash of the prompt, a job posting json
+    for the job post prompt, or candidate scores when the prompt lists candidates ("Candidate ID: ...").
+    `latency` seconds (+ `latency_per_1k_chars` for the prompt size) are slept per call
+    and `error_rate` of calls fail with a 429 error.
+    stream() yields the same response in chunks of `chunk_size` characters.
+    """
+
+    def __init__(self, latency=0.2, error_rate=0.0, seed=0, latency_per_1k_chars=0.0, chunk_size=16):
+        self.latency = latency
+        self.chunk_size = chunk_size
+        self.latency_per_1k_chars = latency_per_1k_chars
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.calls = 0
+
+    def invoke(self, input, config=None, **kwargs):
+        prompt = input.to_string() if hasattr(input, "to_string") else str(input)
+        with self.lock:
+            self.calls += 1
+            failed = self.random.random() < self.error_rate
+        time.sleep(self.latency + self.latency_per_1k_chars * len(prompt) / 1000)
+        if failed:
+            raise RateLimitError("429 RESOURCE_EXHAUSTED")
+        if "Candidate ID:" in prompt:
+            return AIMessage(content=json.dumps(fake_scores_json(prompt)))
+        if "SCRAPED TEXT FROM WEBSITE" in prompt:
+            return AIMessage(content=json.dumps(fake_job_json(prompt)))
+        return AIMessage(content=json.dumps(fake_resume_json(prompt)))
+
+    def stream(self, input, config=None, **kwargs):
+        content = self.invoke(input, config, **kwargs).content
+        for i in range(0, len(content), self.chunk_size):
+            yield AIMessageChunk(content=content[i:i + self.chunk_size])
+
+
+def fake_resume_json(text):
+    digest = hashlib.sha1(text.encode("utf-8")).hexdigest()
+    rng = random.Random(digest)
+    return {
+        "name": f"Candidate {digest[:8]}",
+        "email": f"{digest[:8]}@example.com",
+        "phone": "not available",
+        "role": rng.choice(["Data Scientist", "ML Engineer", "Data Analyst", "Software Engineer"]),
+        "experience_years": rng.randint(0, 10),
+        "skills": rng.sample(SKILLS, 6),
+        "education": "B.Tech in Computer Science",
+        "projects": [{"title": f"Project {i}", "description": "Built an end to end pipeline."} for i in range(2)],
+        "certifications": [],
+        "summary": "Synthetic candidate generated for benchmarking.",
+    }
+
+
+def fake_job_json(text):
+    rng = random.Random(hashlib.sha1(text.encode("utf-8")).hexdigest())
+    skills = rng.sample(SKILLS, 5)
+    return {"job_posting": [{
+        "role": rng.choice(["Data Scientist", "ML Engineer", "Data Analyst"]),
+        "company": "Example Corp",
+        "location": "Remote",
+        "experience_required": rng.randint(0, 5),
+        "skills": skills,
+        "skill_classification": {"must_have": skills[:2], "important": skills[2:4], "nice_to_have": skills[4:]},
+        "description": "Synthetic job posting generated for benchmarking.",
+        "employment_type": "Full-time",
+        "posted_date": "not available",
+    }]}
+
+
+def fake_scores_json(text):
+    ids = re.findall(r"Candidate ID: (\S+)", text)
+    return {"candidates": [
+        {"id": candidate_id, "name": candidate_id, "score": int(hashlib.sha1(candidate_id.encode()).hexdigest(), 16) % 101,
+         "confidence": "medium", "strengths": ["Relevant skills"], "gaps": ["None noted"],
+         "explanation": "Synthetic evaluation."}
+        for candidate_id in ids
+    ]}
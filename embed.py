@@ -6,9 +6,12 @@ from langchain_core.output_parsers import JsonOutputParser
 from src.functions import load_pdf_file, filter_to_minimal_docs, resume_to_text, resume_features_extraction, embedding_model
 from src.prompts import resume_prompt
 from src.utils import clean_text
-from langchain_community.vectorstores import Pinecone as PineconeVectorStore
+from src.vectorstore import LocalVectorStore, sync_documents, stored_ids
+from src.sparse import SparseIndex
+from src import config
+from src.metrics import metrics, UsageCallback
+from langchain_pinecone import PineconeVectorStore
 from pinecone import Pinecone, ServerlessSpec
-# from langchain_community.vectorstores import FAISS
 
 import os
 
@@ -22,7 +25,8 @@ parser = JsonOutputParser()
 llm = ChatGoogleGenerativeAI(
     model="gemini-2.5-flash",      
     temperature=0.7,
-    google_api_key=os.environ["GEMINI_API_KEY"]
+    google_api_key=os.environ["GEMINI_API_KEY"],
+    callbacks=[UsageCallback(metrics)]
 ) 
 
 # Initializing the resume loading and import feature extraction out of each candidate resume using llm 
@@ -32,21 +36,32 @@ llm = ChatGoogleGenerativeAI(
 
 # print(resume_extraction)
 
-def building_vectordb(resume_extraction,embedding_model):
-
-    # Initializing the embedding model
-    embeddings = embedding_model()
+def connecting_vectordb(embeddings,mode=None,backend=None):
+    """
+    Connect to the vector store (creating the pinecone index, or loading the local index, if needed)
+    without storing anything. backend="pinecone" (default) uses the pinecone index, backend="local" an
+    in-process numpy/faiss index saved under config.LOCAL_INDEX_PATH. mode="rebuild" starts from an empty index.
+    """
+    mode = mode or config.VECTORDB_MODE
+    backend = backend or config.VECTOR_BACKEND
 
+    # local index: loaded from disk, no network round trip for the search
+    if backend == "local":
+        if mode == "incremental" and LocalVectorStore.exists(config.LOCAL_INDEX_PATH):
+            return LocalVectorStore.load(config.LOCAL_INDEX_PATH, embeddings, index_type=config.LOCAL_INDEX_TYPE)
+        return LocalVectorStore(embeddings, index_type=config.LOCAL_INDEX_TYPE)
 
-    # configuring pinecone to store embedding for each candidate resume
-    pc = Pinecone(api_key=os.environ.get('PINECONE_API_KEY'))
+    # configuring pinecone to store embedding for each candidate resume, with a pool of http connections
+    pc = Pinecone(api_key=os.environ.get('PINECONE_API_KEY'), pool_threads=config.PINECONE_POOL_THREADS)
 
     # index name for pinecone database
-    index_name = "candidate-matching"  
+    index_name = config.PINECONE_INDEX_NAME
 
-    # creating an index pinecone database if it is present in database it will delete then again create it
-    if index_name in pc.list_indexes().names():
+    # in rebuild mode the index is deleted if it is present in database, then created again
+    if mode == "rebuild" and index_name in pc.list_indexes().names():
         pc.delete_index(index_name)
+
+    if index_name not in pc.list_indexes().names():
         pc.create_index(
             name=index_name,
             dimension=3072, # high dimensional embedding to generate or retrieve better context
@@ -54,31 +69,45 @@ def building_vectordb(resume_extraction,embedding_model):
             spec=ServerlessSpec(cloud="aws", region="us-east-1"),
         )
         
-    # index = pc.Index(index_name)
-
-    # connecting and storing embedding for each candidate resumes
-    vectorstore = PineconeVectorStore.from_documents(
-        documents=resume_extraction,
-        index_name=index_name,
-        embedding=embeddings,
-    )
-
-    return vectorstore
-
-
-
-
-
-
-
-
+    index = pc.Index(index_name, pool_threads=config.PINECONE_POOL_THREADS)
+    return PineconeVectorStore(index=index, embedding=embeddings, text_key="text")
 
 
+def building_vectordb(resume_extraction,embedding_model,mode=None,backend=None):
+    """
+    Store the candidate documents in the vector store and return it.
+    mode="incremental" (default) only embeds new or changed candidates under content derived ids and deletes
+    the ones no longer in the pool, mode="rebuild" deletes and recreates the whole index.
+    """
+    mode = mode or config.VECTORDB_MODE
 
+    # Initializing the embedding model
+    embeddings = embedding_model()
 
+    vectorstore = connecting_vectordb(embeddings, mode=mode, backend=backend)
 
+    # connecting and storing embedding for each candidate resumes, only the ones not stored yet get embedded
+    sync_documents(vectorstore, resume_extraction, existing_ids=stored_ids(vectorstore) if mode == "incremental" else set())
+    if isinstance(vectorstore, LocalVectorStore):
+        vectorstore.save(config.LOCAL_INDEX_PATH)
 
+    return vectorstore
 
 
+def loading_sparse_index(path=None):
+    # bm25 index saved alongside the candidate store, a new one if missing or built with another analyzer
+    path = path or config.SPARSE_INDEX_PATH
+    sparse_index = SparseIndex.load(path) if os.path.isfile(path) else None
+    return sparse_index if sparse_index is not None else SparseIndex()
 
 
+def building_sparse_index(resume_extraction,path=None):
+    """
+    Load the bm25 index saved alongside the candidate store, bring it in line with the
+    current candidates (only new ones get tokenized) and save it back.
+    """
+    path = path or config.SPARSE_INDEX_PATH
+    sparse_index = loading_sparse_index(path)
+    sparse_index.sync(resume_extraction)
+    sparse_index.save(path)
+    return sparse_index
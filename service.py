@@ -0,0 +1,205 @@
+# local cli / http service in front of one warm MatchingEngine
+# usage:
+#   python service.py match --job job.txt --resumes resumes
+#   python service.py match --job job.txt                        (whole stored talent pool)
+#   python service.py candidates --min-experience 3 --skill python --skill sql
+#   python service.py screen --jobs jobs/ --resumes resumes      (many job descriptions at once)
+#   python service.py watch resumes_inbox                        (index new pdfs as they are dropped in)
+#   python service.py serve --port 8080 [--watch resumes_inbox]
+#     POST /ingest {"directory": "resumes"}
+#     POST /match  {"directory": "resumes", "job_description": "...", "top_k": 5, "ranking_mode": "single"}
+#     POST /candidates {"min_experience": 3, "skills": ["python"], "any_skills": [...], "limit": 100}
+#     POST /screen {"directory": "resumes", "job_descriptions": ["...", "..."], "top_k": 5, "rank": true}
+#     GET  /metrics (prometheus text), GET /metrics.json
+
+import argparse
+import glob
+import json
+import os
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from src.engine import MatchingEngine
+from src.metrics import metrics
+
+
+def candidate_summary(candidates):
+    return [{"id": doc.metadata["vector_id"], "name": doc.metadata["name"],
+             "experience": doc.metadata["experience"]} for doc in candidates]
+
+
+def handle_ingest(engine, payload):
+    candidates = engine.ingest_directory(payload["directory"])
+    return {"candidates": candidate_summary(candidates)}
+
+
+def handle_match(engine, payload):
+    # already extracted resumes come from the cache, without a directory the whole stored talent pool is screened
+    candidates = engine.ingest_directory(payload["directory"]) if payload.get("directory") else None
+    return engine.match(
+        payload["job_description"], candidates,
+        top_k=int(payload.get("top_k", 5)),
+        ranking_mode=payload.get("ranking_mode", "single"),
+        temperature=float(payload.get("temperature", 0.7)),
+    )
+
+
+def handle_screen(engine, payload):
+    candidates = engine.ingest_directory(payload["directory"])
+    return {"requisitions": engine.screen_jobs(
+        payload["job_descriptions"], candidates,
+        top_k=int(payload.get("top_k", 5)),
+        rank=bool(payload.get("rank", True)),
+        temperature=float(payload.get("temperature", 0.7)),
+    )}
+
+
+# job description files: the given files, or every .txt file of the given directories
+def read_job_files(paths):
+    files = []
+    for path in paths:
+        files += sorted(glob.glob(os.path.join(path, "*.txt"))) if os.path.isdir(path) else [path]
+    job_descriptions = []
+    for path in files:
+        with open(path, encoding="utf-8") as f:
+            job_descriptions.append(f.read())
+    return files, job_descriptions
+
+
+def handle_candidates(engine, payload):
+    candidates = engine.talent_pool(
+        min_experience=payload.get("min_experience"), all_skills=payload.get("skills"),
+        any_skills=payload.get("any_skills"), limit=payload.get("limit"),
+    )
+    return {"count": len(candidates), "candidates": candidate_summary(candidates)}
+
+
+ROUTES = {"/ingest": handle_ingest, "/match": handle_match, "/screen": handle_screen, "/candidates": handle_candidates}
+
+
+def make_handler(engine):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path == "/metrics":
+                return self.respond_text(200, metrics.to_prometheus(), "text/plain; version=0.0.4")
+            if self.path == "/metrics.json":
+                return self.respond(200, metrics.snapshot())
+            self.respond(404, {"error": f"unknown path {self.path}"})
+
+        def do_POST(self):
+            route = ROUTES.get(self.path)
+            if route is None:
+                return self.respond(404, {"error": f"unknown path {self.path}"})
+            try:
+                length = int(self.headers.get("Content-Length", 0))
+                payload = json.loads(self.rfile.read(length) or b"{}")
+                self.respond(200, route(engine, payload))
+            except (KeyError, ValueError) as error:
+                self.respond(400, {"error": str(error)})
+            except Exception as error:
+                self.respond(500, {"error": str(error)})
+
+        def respond(self, status, body):
+            self.respond_text(status, json.dumps(body, default=str), "application/json")
+
+        def respond_text(self, status, text, content_type):
+            data = text.encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+    return Handler
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="AI candidate matching service")
+    arg_parser.add_argument("--metrics-out", help="write the stage timings and counters of the run to this json file")
+    commands = arg_parser.add_subparsers(dest="command", required=True)
+
+    ingest = commands.add_parser("ingest", help="extract and index every resume of a directory")
+    ingest.add_argument("directory")
+
+    match = commands.add_parser("match", help="screen the resumes of a directory against a job description")
+    match.add_argument("--job", required=True, help="text file with the job description")
+    match.add_argument("--resumes", help="directory with the resume pdfs, default: the whole stored talent pool")
+    match.add_argument("--top-k", type=int, default=5)
+    match.add_argument("--ranking-mode", choices=["single", "map-reduce"], default="single")
+
+    candidates = commands.add_parser("candidates", help="query the stored talent pool")
+    candidates.add_argument("--min-experience", type=float)
+    candidates.add_argument("--skill", action="append", help="required skill, can be repeated")
+    candidates.add_argument("--any-skill", action="append", help="at least one of these skills, can be repeated")
+    candidates.add_argument("--limit", type=int)
+
+    screen = commands.add_parser("screen", help="screen the resumes of a directory against many job descriptions")
+    screen.add_argument("--jobs", required=True, nargs="+", help="job description text files or directories of them")
+    screen.add_argument("--resumes", required=True, help="directory with the resume pdfs")
+    screen.add_argument("--top-k", type=int, default=5)
+    screen.add_argument("--no-rank", action="store_true", help="retrieval shortlists only, no llm ranking")
+
+    commands.add_parser("fields", help="embed the fields of the stored candidates that have no field vectors yet "
+                                       "(after turning MULTIVECTOR_MODE on)")
+
+    watch = commands.add_parser("watch", help="keep the indexes current with a resumes folder until interrupted")
+    watch.add_argument("directory")
+    watch.add_argument("--delete-processed", action="store_true", help="remove the pdfs once they are ingested")
+
+    serve = commands.add_parser("serve", help="run the http service")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8080)
+    serve.add_argument("--watch", help="also index the pdfs dropped in this folder, in the background")
+
+    args = arg_parser.parse_args()
+    engine = MatchingEngine()
+
+    if args.command == "ingest":
+        print(json.dumps(handle_ingest(engine, {"directory": args.directory}), indent=2))
+    elif args.command == "match":
+        with open(args.job, encoding="utf-8") as f:
+            job_description = f.read()
+        result = handle_match(engine, {"directory": args.resumes, "job_description": job_description,
+                                       "top_k": args.top_k, "ranking_mode": args.ranking_mode})
+        print(json.dumps(result, indent=2, default=str))
+    elif args.command == "candidates":
+        result = handle_candidates(engine, {"min_experience": args.min_experience, "skills": args.skill,
+                                            "any_skills": args.any_skill, "limit": args.limit})
+        print(json.dumps(result, indent=2, default=str))
+    elif args.command == "screen":
+        files, job_descriptions = read_job_files(args.jobs)
+        result = handle_screen(engine, {"directory": args.resumes, "job_descriptions": job_descriptions,
+                                        "top_k": args.top_k, "rank": not args.no_rank})
+        for requisition in result["requisitions"]:
+            requisition["job"]["file"] = files[requisition["job"]["requisition"]]
+        print(json.dumps(result, indent=2, default=str))
+    elif args.command == "fields":
+        if engine.field_index is None:
+            arg_parser.error("set MULTIVECTOR_MODE to weighted or max first")
+        added = engine.index_fields([doc.metadata["vector_id"] for doc in engine.talent_pool()])
+        print(json.dumps({"added": added, "indexed": len(engine.field_index)}))
+    elif args.command == "watch":
+        def report(paths, candidates):
+            print(json.dumps({"files": paths, "candidates": candidate_summary(candidates)}, default=str), flush=True)
+
+        worker = engine.watch(args.directory, delete_processed=args.delete_processed or None, on_ingested=report)
+        print(f"watching {args.directory}")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            worker.stop()
+    else:
+        if args.watch:
+            engine.watch(args.watch)
+        server = ThreadingHTTPServer((args.host, args.port), make_handler(engine))
+        print(f"serving on http://{args.host}:{args.port}")
+        server.serve_forever()
+
+    if args.metrics_out:
+        with open(args.metrics_out, "w", encoding="utf-8") as f:
+            f.write(metrics.to_json())
+
+
+if __name__ == "__main__":
+    main()
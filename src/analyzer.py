@@ -0,0 +1,124 @@
+# text analyzer shared by the bm25 indexing (candidate text) and querying (job description text)
+
+import re
+from functools import lru_cache
+
+
+# labels written by resume_to_text / job_post_to_text, mapped to the field tag their tokens get (None: no tag)
+FIELD_LABELS = {
+    "name": None,
+    "role": "role",
+    "experience": None,
+    "experience required": None,
+    "skills": "skill",
+    "skill classification": "skill",
+    "must have": "skill",
+    "important": "skill",
+    "nice to have": "skill",
+    "education": None,
+    "projects": None,
+    "summary": None,
+    "certifications": "cert",
+    "company": None,
+    "location": None,
+    "employment type": None,
+    "posted date": None,
+    "description": None,
+}
+
+# different spellings of the same skill, normalised to one token
+SKILL_SYNONYMS = {
+    "machine_learning": ["machine learning", "ml"],
+    "deep_learning": ["deep learning", "dl"],
+    "nlp": ["natural language processing", "nlp"],
+    "computer_vision": ["computer vision"],
+    "generative_ai": ["generative ai", "gen ai", "genai"],
+    "ai": ["artificial intelligence", "ai"],
+    "llm": ["large language models", "large language model", "llms", "llm"],
+    "javascript": ["javascript", "js"],
+    "nodejs": ["node.js", "nodejs", "node js"],
+    "postgresql": ["postgresql", "postgres"],
+    "kubernetes": ["kubernetes", "k8s"],
+    "scikit_learn": ["scikit-learn", "scikit learn", "sklearn"],
+    "power_bi": ["power bi", "powerbi"],
+    "aws": ["amazon web services", "aws"],
+    "gcp": ["google cloud platform", "google cloud", "gcp"],
+    "pytorch": ["pytorch", "torch"],
+    "oop": ["object oriented programming", "oops", "oop"],
+    "dsa": ["data structures and algorithms", "data structures", "dsa"],
+    "ci_cd": ["ci/cd", "ci cd", "cicd"],
+    "rest_api": ["restful apis", "restful api", "rest apis", "rest api"],
+}
+
+STOPWORDS = frozenset("""
+a an and are as at be been but by can for from has have in into is it its of on or our that the their this to
+was we were will with you your not available none years year yrs yr etc using use used work working per
+""".split())
+
+# single letter tokens that are actually skills
+SINGLE_LETTER_SKILLS = frozenset({"c", "r"})
+
+
+class Analyzer:
+    """
+    Turns text into bm25 terms: lowercase, skill synonyms normalised, punctuation stripped
+    (keeping c++, c#, node.js style tokens), stopwords and header labels dropped.
+    Tokens under a tagged header (e.g. "Skills:", "Must Have:") are also emitted as "<tag>:<token>",
+    so skill matches between a resume and a job post count more than a word in a summary.
+    Regexes are compiled once and results are cached per text.
+    """
+
+    version = "analyzer-v1"
+
+    def __init__(self, field_labels=FIELD_LABELS, synonyms=SKILL_SYNONYMS, stopwords=STOPWORDS, cache_size=8192):
+        self.field_labels = field_labels
+        self.stopwords = stopwords
+        labels = sorted(field_labels, key=len, reverse=True)
+        self.label_pattern = re.compile(
+            r"^[ \t]*(" + "|".join(re.escape(l).replace(r"\ ", r"\s+") for l in labels) + r")[ \t]*:",
+            re.IGNORECASE | re.MULTILINE,
+        )
+        self.canonical = {}
+        for canonical, variants in synonyms.items():
+            for variant in variants:
+                self.canonical[variant] = canonical
+        variants = sorted(self.canonical, key=len, reverse=True)
+        self.synonym_pattern = re.compile(
+            r"(?<![\w+#.])(" + "|".join(re.escape(v) for v in variants) + r")(?![\w+#])"
+        )
+        self.token_pattern = re.compile(r"[a-z0-9_][a-z0-9_+#]*(?:\.[a-z0-9_]+)*")
+        self._cached = lru_cache(maxsize=cache_size)(self._analyze)
+
+    def __call__(self, text):
+        return list(self._cached(text))
+
+    def fields(self, text):
+        # (field tag, segment) pairs, split on the header labels
+        segments = []
+        position, tag = 0, None
+        for match in self.label_pattern.finditer(text):
+            segments.append((tag, text[position:match.start()]))
+            label = " ".join(match.group(1).lower().split())
+            tag = self.field_labels.get(label)
+            position = match.end()
+        segments.append((tag, text[position:]))
+        return segments
+
+    def tokenize(self, text):
+        text = self.synonym_pattern.sub(lambda m: self.canonical[m.group(1)], text.lower())
+        return [
+            token for token in self.token_pattern.findall(text)
+            if token not in self.stopwords and (len(token) > 1 or token in SINGLE_LETTER_SKILLS)
+        ]
+
+    def _analyze(self, text):
+        tokens = []
+        for tag, segment in self.fields(text):
+            segment_tokens = self.tokenize(segment)
+            tokens.extend(segment_tokens)
+            if tag:
+                tokens.extend(f"{tag}:{token}" for token in segment_tokens)
+        return tuple(tokens)
+
+
+analyze = Analyzer()
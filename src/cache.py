@@ -0,0 +1,218 @@
+# persistent on-disk caches (sqlite) so repeated runs do not pay for the same llm calls again
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from src import config
+from src.metrics import metrics
+
+
+class DiskCache:
+    """
+    Small key -> json value cache stored in a sqlite file.
+    The total size of the stored values is bounded by `max_bytes`, least recently used
+    entries are evicted first. Hits and misses are counted for the lifetime of the object,
+    and in the process metrics as `<name>_cache_hits` / `<name>_cache_misses`.
+    """
+
+    name = "disk"
+
+    def __init__(self, path, max_bytes=256 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, accessed REAL NOT NULL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)")
+        self.conn.commit()
+
+    def get(self, key):
+        with self.lock:
+            row = self.conn.execute("SELECT value FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                metrics.incr(f"{self.name}_cache_misses")
+                return None
+            self.hits += 1
+            metrics.incr(f"{self.name}_cache_hits")
+            self.conn.execute("UPDATE entries SET accessed = ? WHERE key = ?", (time.time(), key))
+            self.conn.commit()
+        return json.loads(row[0])
+
+    def set(self, key, value):
+        data = json.dumps(value)
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, size, accessed) VALUES (?, ?, ?, ?)",
+                (key, data, len(data), time.time()),
+            )
+            self._evict()
+            self.conn.commit()
+
+    def get_many(self, keys):
+        """{key: value} for the keys found, in one transaction."""
+        keys = list(dict.fromkeys(keys))
+        found = {}
+        with self.lock:
+            for i in range(0, len(keys), 500):
+                chunk = keys[i:i + 500]
+                rows = self.conn.execute(
+                    f"SELECT key, value FROM entries WHERE key IN ({','.join('?' * len(chunk))})", chunk
+                ).fetchall()
+                found.update(rows)
+            now = time.time()
+            self.conn.executemany("UPDATE entries SET accessed = ? WHERE key = ?", [(now, key) for key in found])
+            self.conn.commit()
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        metrics.incr(f"{self.name}_cache_hits", len(found))
+        metrics.incr(f"{self.name}_cache_misses", len(keys) - len(found))
+        return {key: json.loads(value) for key, value in found.items()}
+
+    def set_many(self, items):
+        rows = [(key, json.dumps(value)) for key, value in items.items()]
+        now = time.time()
+        with self.lock:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO entries (key, value, size, accessed) VALUES (?, ?, ?, ?)",
+                [(key, data, len(data), now) for key, data in rows],
+            )
+            self._evict()
+            self.conn.commit()
+
+    def _evict(self):
+        total = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in self.conn.execute("SELECT key, size FROM entries ORDER BY accessed").fetchall():
+            self.conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def __len__(self):
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def stats(self):
+        with self.lock:
+            entries, size = self.conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        return {"hits": self.hits, "misses": self.misses, "entries": entries, "bytes": size}
+
+    def clear(self):
+        with self.lock:
+            self.conn.execute("DELETE FROM entries")
+            self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+
+# hash of the raw file bytes, so a re-uploaded resume maps to the same entry whatever its path
+def file_hash(path, chunk_size=1024 * 1024):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def text_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+# content hash of a loaded document: its pdf bytes when the file is still there, else its text
+def source_hash(doc):
+    source = doc.metadata.get("source")
+    if source and os.path.isfile(source):
+        return file_hash(source)
+    return text_hash(doc.page_content)
+
+
+# version of the extraction: changes whenever the prompt or the model changes
+def extraction_version(prompt_template, llm_model):
+    template = getattr(prompt_template, "template", str(prompt_template))
+    model = getattr(llm_model, "model", type(llm_model).__name__)
+    return text_hash(f"{model}\n{template}")[:16]
+
+
+class ExtractionCache(DiskCache):
+    """
+    Cache of the structured resume json and its resume_to_text output,
+    keyed by the hash of the pdf bytes, the page text and the prompt/model version.
+    """
+
+    name = "extraction"
+
+    def __init__(self, path=None, max_bytes=None):
+        super().__init__(
+            path or config.EXTRACTION_CACHE_PATH,
+            max_bytes if max_bytes is not None else config.EXTRACTION_CACHE_MAX_MB * 1024 * 1024,
+        )
+        self._file_hashes = OrderedDict()   # path -> ((size, mtime_ns), file hash), the last FILE_HASH_MEMO_SIZE
+        self._file_hashes_lock = threading.Lock()
+
+    def key_for(self, doc, version):
+        return f"{self.source_hash(doc)}:{text_hash(doc.page_content)[:16]}:{version}"
+
+    def source_hash(self, doc):
+        # file hashes are remembered per path while the file's size and mtime stay the same
+        # (a file edited in place is hashed again), for the most recently used paths only
+        source = doc.metadata.get("source")
+        if not source or not os.path.isfile(source):
+            return text_hash(doc.page_content)
+        stat = os.stat(source)
+        signature = (stat.st_size, stat.st_mtime_ns)
+        with self._file_hashes_lock:
+            memo = self._file_hashes.get(source)
+            if memo is not None and memo[0] == signature:
+                self._file_hashes.move_to_end(source)
+                return memo[1]
+        digest = file_hash(source)
+        with self._file_hashes_lock:
+            self._file_hashes[source] = (signature, digest)
+            self._file_hashes.move_to_end(source)
+            while len(self._file_hashes) > config.FILE_HASH_MEMO_SIZE:
+                self._file_hashes.popitem(last=False)
+        return digest
+
+
+# version of a candidate set: changes whenever a candidate is added, removed or its resume changes
+# (vector ids are content ids)
+def candidate_set_version(candidates, id_key="vector_id"):
+    return text_hash(",".join(sorted(doc.metadata[id_key] for doc in candidates)))[:16]
+
+
+class QueryCache(DiskCache):
+    """
+    Cache of the query side of a screening, so a repeated (or only re-formatted) job description
+    is answered without llm calls: the extracted job document keyed by the hash of the normalised
+    clean_text of the job description, the fused retrieval shortlist and the llm ranking keyed by
+    that hash plus the candidate set version (and the settings they depend on). A changed candidate
+    pool has a new version, so the results cached for the old one are never served for it.
+    Query embeddings are cached by the embeddings layer already.
+    """
+
+    name = "query"
+
+    def __init__(self, path=None, max_bytes=None):
+        super().__init__(
+            path or config.QUERY_CACHE_PATH,
+            max_bytes if max_bytes is not None else config.QUERY_CACHE_MAX_MB * 1024 * 1024,
+        )
+
+    @staticmethod
+    def key(kind, *parts):
+        return f"{kind}:" + ":".join(text_hash(str(part))[:16] for part in parts)
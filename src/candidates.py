@@ -0,0 +1,189 @@
+# persistent candidate store (sqlite): structured resume json, text, source hash and vector id of every candidate
+
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from langchain_core.documents import Document
+
+from src import config
+from src.fusion import as_number
+from src.metrics import metrics
+from src.prescoring import skill_key
+
+
+class CandidateStore:
+    """
+    Every extracted candidate, keyed by its vector id (content id, stable across runs and uploads).
+    Experience and normalised skills are indexed columns, so a talent pool of tens of thousands of
+    candidates can be narrowed down in sqlite; queries return light documents (metadata only) and
+    the full text is loaded for the shortlisted candidates only (`hydrate` / `documents`).
+    """
+
+    def __init__(self, path=None):
+        self.path = path or config.CANDIDATE_STORE_PATH
+        self.lock = threading.Lock()
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.conn.executescript(
+            "CREATE TABLE IF NOT EXISTS candidates ("
+            "vector_id TEXT PRIMARY KEY, name TEXT, experience REAL NOT NULL, source TEXT, source_hash TEXT, "
+            "resume_json TEXT NOT NULL, text TEXT NOT NULL, updated REAL NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS candidates_experience ON candidates (experience);"
+            "CREATE INDEX IF NOT EXISTS candidates_source_hash ON candidates (source_hash);"
+            "CREATE INDEX IF NOT EXISTS candidates_source ON candidates (source);"
+            "CREATE TABLE IF NOT EXISTS candidate_skills ("
+            "skill TEXT NOT NULL, vector_id TEXT NOT NULL, PRIMARY KEY (skill, vector_id)) WITHOUT ROWID;"
+            "CREATE INDEX IF NOT EXISTS candidate_skills_id ON candidate_skills (vector_id);"
+        )
+        self.conn.commit()
+
+    def __len__(self):
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM candidates").fetchone()[0]
+
+    def __contains__(self, vector_id):
+        with self.lock:
+            return self.conn.execute("SELECT 1 FROM candidates WHERE vector_id = ?", (vector_id,)).fetchone() is not None
+
+    @metrics.timed("candidate_store_upsert")
+    def upsert(self, records):
+        """
+        records: (candidate document, resume json, source hash, source path) tuples, written in one
+        transaction. The source is the file the candidate was extracted from (None for plain text).
+        """
+        now = time.time()
+        rows, skills = [], []
+        for doc, resume_json, source_hash, source in records:
+            vector_id = doc.metadata["vector_id"]
+            rows.append((vector_id, doc.metadata.get("name"), as_number(doc.metadata.get("experience")),
+                         source, source_hash, json.dumps(resume_json), doc.page_content, now))
+            keys = {skill_key(skill) for skill in doc.metadata.get("skills") or []} - {""}
+            skills += [(key, vector_id) for key in keys]
+        with self.lock:
+            self.conn.executemany("DELETE FROM candidate_skills WHERE vector_id = ?", [(row[0],) for row in rows])
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO candidates (vector_id, name, experience, source, source_hash, resume_json, "
+                "text, updated) VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows
+            )
+            self.conn.executemany("INSERT OR IGNORE INTO candidate_skills (skill, vector_id) VALUES (?, ?)", skills)
+            self.conn.commit()
+        metrics.incr("candidates_stored", len(rows))
+
+    def delete(self, vector_ids):
+        with self.lock:
+            self.conn.executemany("DELETE FROM candidate_skills WHERE vector_id = ?", [(i,) for i in vector_ids])
+            self.conn.executemany("DELETE FROM candidates WHERE vector_id = ?", [(i,) for i in vector_ids])
+            self.conn.commit()
+
+    @metrics.timed("candidate_store_query")
+    def query(self, min_experience=None, all_skills=None, any_skills=None, vector_ids=None, limit=None):
+        """
+        Light documents (empty page_content) of the candidates with at least `min_experience` years,
+        every skill of `all_skills` and one of `any_skills` (skills are matched normalised, "ML" finds
+        "Machine Learning"), optionally among `vector_ids`. Ordered by experience, most first.
+        Their metadata holds vector_id, id, name, experience, skills and certifications.
+        """
+        where, params = [], []
+        if min_experience is not None:
+            where.append("c.experience >= ?")
+            params.append(as_number(min_experience))
+        for skill in {skill_key(s) for s in all_skills or []} - {""}:
+            where.append("c.vector_id IN (SELECT vector_id FROM candidate_skills WHERE skill = ?)")
+            params.append(skill)
+        any_keys = sorted({skill_key(s) for s in any_skills or []} - {""})
+        if any_keys:
+            where.append(f"c.vector_id IN (SELECT vector_id FROM candidate_skills WHERE skill IN "
+                         f"({','.join('?' * len(any_keys))}))")
+            params += any_keys
+        if vector_ids is not None:
+            vector_ids = list(vector_ids)
+            if not vector_ids:
+                return []
+            where.append(f"c.vector_id IN ({','.join('?' * len(vector_ids))})")
+            params += vector_ids
+        sql = "SELECT c.vector_id, c.name, c.experience, c.resume_json FROM candidates c"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY c.experience DESC, c.vector_id"
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+        with self.lock:
+            rows = self.conn.execute(sql, params).fetchall()
+        return [self._light_document(*row) for row in rows]
+
+    @staticmethod
+    def _light_document(vector_id, name, experience, resume_json):
+        resume_json = json.loads(resume_json)
+        certifications = resume_json.get("certifications")
+        return Document(page_content="", metadata={
+            "id": vector_id, "vector_id": vector_id, "name": name,
+            "experience": resume_json.get("experience_years", experience),
+            "skills": resume_json.get("skills") or [],
+            "certifications": certifications if isinstance(certifications, list) else [],
+        })
+
+    def texts(self, vector_ids):
+        """{vector id: candidate text} of the given candidates."""
+        vector_ids = list(dict.fromkeys(vector_ids))
+        found = {}
+        with self.lock:
+            for i in range(0, len(vector_ids), 500):
+                chunk = vector_ids[i:i + 500]
+                found.update(self.conn.execute(
+                    f"SELECT vector_id, text FROM candidates WHERE vector_id IN ({','.join('?' * len(chunk))})", chunk
+                ).fetchall())
+        return found
+
+    def hydrate(self, docs):
+        """Fill in the text of the light documents in place (one query for all of them), returns docs."""
+        texts = self.texts(doc.metadata["vector_id"] for doc in docs if not doc.page_content)
+        for doc in docs:
+            if not doc.page_content and doc.metadata["vector_id"] in texts:
+                doc.page_content = texts[doc.metadata["vector_id"]]
+        return docs
+
+    def documents(self, vector_ids, text=True):
+        """
+        Documents of the given candidates, in the given order (unknown ids are skipped),
+        light ones (metadata only) with text=False.
+        """
+        docs = {doc.metadata["vector_id"]: doc for doc in self.query(vector_ids=vector_ids)}
+        docs = [docs[i] for i in vector_ids if i in docs]
+        return self.hydrate(docs) if text else docs
+
+    def resume_json(self, vector_id):
+        with self.lock:
+            row = self.conn.execute("SELECT resume_json FROM candidates WHERE vector_id = ?", (vector_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def resume_jsons(self, vector_ids):
+        """{vector id: resume json} of the given candidates."""
+        vector_ids = list(dict.fromkeys(vector_ids))
+        found = {}
+        with self.lock:
+            for i in range(0, len(vector_ids), 500):
+                chunk = vector_ids[i:i + 500]
+                found.update(self.conn.execute(
+                    f"SELECT vector_id, resume_json FROM candidates WHERE vector_id IN ({','.join('?' * len(chunk))})",
+                    chunk
+                ).fetchall())
+        return {vector_id: json.loads(value) for vector_id, value in found.items()}
+
+    def by_source(self, source):
+        """Vector ids of the candidates extracted from the file at this path."""
+        with self.lock:
+            rows = self.conn.execute("SELECT vector_id FROM candidates WHERE source = ?", (source,)).fetchall()
+        return [row[0] for row in rows]
+
+    def by_source_hash(self, source_hash):
+        """Vector ids of the candidates extracted from the file (or text) with this hash."""
+        with self.lock:
+            rows = self.conn.execute("SELECT vector_id FROM candidates WHERE source_hash = ?", (source_hash,)).fetchall()
+        return [row[0] for row in rows]
+
+    def close(self):
+        self.conn.close()
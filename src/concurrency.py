@@ -0,0 +1,153 @@
+# helpers to run many llm calls in parallel without hitting the gemini quota
+
+import contextlib
+import random
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from src.metrics import metrics
+
+
+# status codes worth retrying: rate limit and transient server errors
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+RETRYABLE_MESSAGE = re.compile(r"\b(429|500|502|503|504)\b|RESOURCE_EXHAUSTED|UNAVAILABLE|rate limit", re.IGNORECASE)
+
+
+class TokenBucket:
+    """
+    Thread safe token bucket limiter.
+    `rate` tokens are added per second up to `capacity`, every call to acquire() takes one token
+    and blocks until it is available.
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    @classmethod
+    def per_minute(cls, requests_per_minute, capacity=None):
+        return cls(requests_per_minute / 60.0, capacity)
+
+    def acquire(self, tokens=1):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                wait = (tokens - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class ReadWriteLock:
+    """
+    Many readers or one writer. Writers are preferred: once a writer waits, new readers wait
+    behind it, so a stream of queries can not starve an index update. Not reentrant.
+    """
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.readers = 0
+        self.writing = False
+        self.writers_waiting = 0
+
+    @contextlib.contextmanager
+    def read(self):
+        with self.condition:
+            while self.writing or self.writers_waiting:
+                self.condition.wait()
+            self.readers += 1
+        try:
+            yield
+        finally:
+            with self.condition:
+                self.readers -= 1
+                if not self.readers:
+                    self.condition.notify_all()
+
+    @contextlib.contextmanager
+    def write(self):
+        with self.condition:
+            self.writers_waiting += 1
+            while self.writing or self.readers:
+                self.condition.wait()
+            self.writers_waiting -= 1
+            self.writing = True
+        try:
+            yield
+        finally:
+            with self.condition:
+                self.writing = False
+                self.condition.notify_all()
+
+
+def status_code(error):
+    # gemini / google api / http client errors expose the status under different names
+    for attr in ("status_code", "code", "http_status"):
+        value = getattr(error, attr, None)
+        if isinstance(value, int):
+            return value
+    response = getattr(error, "response", None)
+    value = getattr(response, "status_code", None)
+    return value if isinstance(value, int) else None
+
+
+def is_retryable(error):
+    code = status_code(error)
+    if code is not None:
+        return code in RETRYABLE_STATUS
+    return bool(RETRYABLE_MESSAGE.search(str(error)))
+
+
+def call_with_retry(fn, *args, max_retries=3, base_delay=1.0, max_delay=30.0, rate_limiter=None, **kwargs):
+    """
+    Call fn(*args, **kwargs), retrying on 429/5xx errors with exponential backoff and jitter.
+    Every attempt (including retries) first takes a token from rate_limiter if one is given.
+    Retries are counted in the process metrics.
+    """
+    attempt = 0
+    while True:
+        if rate_limiter is not None:
+            rate_limiter.acquire()
+        try:
+            return fn(*args, **kwargs)
+        except Exception as error:
+            if attempt >= max_retries or not is_retryable(error):
+                raise
+            metrics.incr("retries")
+            delay = min(max_delay, base_delay * (2 ** attempt))
+            time.sleep(delay * random.uniform(0.5, 1.0))
+            attempt += 1
+
+
+def bounded_map(fn, items, max_workers=4, on_result=None):
+    """
+    Apply fn to every item on a pool of at most max_workers threads.
+    Results are returned in the same order as items, whichever call finishes first.
+    on_result(index, result) is called in the calling thread as soon as each call completes,
+    e.g. to report progress before the whole batch is done.
+    """
+    items = list(items)
+    if max_workers <= 1 or len(items) <= 1:
+        results = []
+        for index, item in enumerate(items):
+            results.append(fn(item))
+            if on_result is not None:
+                on_result(index, results[-1])
+        return results
+    results = [None] * len(items)
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as executor:
+        futures = {executor.submit(fn, item): index for index, item in enumerate(items)}
+        for future in as_completed(futures):
+            index = futures[future]
+            results[index] = future.result()
+            if on_result is not None:
+                on_result(index, results[index])
+    return results
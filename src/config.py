@@ -0,0 +1,120 @@
+# runtime settings for the pipeline, read from the environment (.env) with sane defaults
+
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def env_int(name, default):
+    value = os.environ.get(name)
+    return int(value) if value not in (None, "") else default
+
+
+def env_float(name, default):
+    value = os.environ.get(name)
+    return float(value) if value not in (None, "") else default
+
+
+# pdf loading (one process per resume file)
+PDF_LOAD_WORKERS = env_int("PDF_LOAD_WORKERS", min(8, os.cpu_count() or 1))
+
+# resume cleaning of large batches (one process per cpu)
+CLEAN_TEXT_WORKERS = env_int("CLEAN_TEXT_WORKERS", min(8, os.cpu_count() or 1))
+
+# resume extraction (parallel llm calls)
+EXTRACTION_MAX_WORKERS = env_int("EXTRACTION_MAX_WORKERS", 8)
+LLM_REQUESTS_PER_MINUTE = env_float("LLM_REQUESTS_PER_MINUTE", 60.0)
+LLM_MAX_RETRIES = env_int("LLM_MAX_RETRIES", 4)
+LLM_RETRY_BASE_DELAY = env_float("LLM_RETRY_BASE_DELAY", 1.0)
+
+# on-disk cache of extracted resumes
+EXTRACTION_CACHE_PATH = os.environ.get("EXTRACTION_CACHE_PATH", os.path.join(".cache", "extraction.sqlite"))
+EXTRACTION_CACHE_MAX_MB = env_int("EXTRACTION_CACHE_MAX_MB", 256)
+FILE_HASH_MEMO_SIZE = env_int("FILE_HASH_MEMO_SIZE", 4096)  # pdf hashes remembered in memory, by path, size and mtime
+
+# persistent candidate store (structured resume json, text, source hash and vector id of every candidate)
+CANDIDATE_STORE_PATH = os.environ.get("CANDIDATE_STORE_PATH", os.path.join(".cache", "candidates.sqlite"))
+
+# background ingestion of a watched resumes folder (off unless INGEST_WATCH_DIR is set)
+INGEST_WATCH_DIR = os.environ.get("INGEST_WATCH_DIR", "")
+INGEST_POLL_SECONDS = env_float("INGEST_POLL_SECONDS", 2.0)
+INGEST_BATCH_SIZE = env_int("INGEST_BATCH_SIZE", 16)
+INGEST_QUEUE_SIZE = env_int("INGEST_QUEUE_SIZE", 4)  # batches waiting for extraction before the watcher blocks
+INGEST_DELETE_PROCESSED = env_int("INGEST_DELETE_PROCESSED", 0)  # 1: remove the pdfs once ingested (inbox folder)
+# uploads are loaded, extracted and indexed INGEST_CHUNK_SIZE files at a time; once resident memory has grown
+# by INGEST_MEMORY_LIMIT_MB during the ingestion the chunks are halved (never below the extraction workers)
+# until it drops again (0: no ceiling)
+INGEST_CHUNK_SIZE = env_int("INGEST_CHUNK_SIZE", 32)
+INGEST_MEMORY_LIMIT_MB = env_int("INGEST_MEMORY_LIMIT_MB", 1024)
+
+# on-disk cache of the query side (job extraction, retrieval shortlist, llm ranking of repeated job descriptions)
+QUERY_CACHE_ENABLED = env_int("QUERY_CACHE_ENABLED", 1)
+QUERY_CACHE_PATH = os.environ.get("QUERY_CACHE_PATH", os.path.join(".cache", "queries.sqlite"))
+QUERY_CACHE_MAX_MB = env_int("QUERY_CACHE_MAX_MB", 64)
+
+# vector store
+VECTOR_BACKEND = os.environ.get("VECTOR_BACKEND", "pinecone")  # pinecone | local
+LOCAL_INDEX_PATH = os.environ.get("LOCAL_INDEX_PATH", os.path.join(".cache", "local_index"))
+LOCAL_INDEX_TYPE = os.environ.get("LOCAL_INDEX_TYPE", "flat")  # flat (exact) | ivf (faiss)
+PINECONE_INDEX_NAME = os.environ.get("PINECONE_INDEX_NAME", "candidate-matching")
+PINECONE_POOL_THREADS = env_int("PINECONE_POOL_THREADS", 8)
+VECTORDB_MODE = os.environ.get("VECTORDB_MODE", "incremental")  # incremental | rebuild
+
+# multi-vector candidate embeddings: one vector per field (skills, experience, projects, summary),
+# scored field by field against the job (weighted | max) as the dense retrieval, off: one vector per resume
+MULTIVECTOR_MODE = os.environ.get("MULTIVECTOR_MODE", "off")  # off | weighted | max
+FIELD_INDEX_PATH = os.environ.get("FIELD_INDEX_PATH", os.path.join(".cache", "field_index.npz"))
+FIELD_EMBEDDING_DIM = env_int("FIELD_EMBEDDING_DIM", 768)  # field vectors cut to this size (int8), 0 keeps all
+MULTIVECTOR_SKILLS_WEIGHT = env_float("MULTIVECTOR_SKILLS_WEIGHT", 0.4)
+MULTIVECTOR_EXPERIENCE_WEIGHT = env_float("MULTIVECTOR_EXPERIENCE_WEIGHT", 0.2)
+MULTIVECTOR_PROJECTS_WEIGHT = env_float("MULTIVECTOR_PROJECTS_WEIGHT", 0.25)
+MULTIVECTOR_SUMMARY_WEIGHT = env_float("MULTIVECTOR_SUMMARY_WEIGHT", 0.15)
+
+# sparse (bm25) index
+SPARSE_INDEX_PATH = os.environ.get("SPARSE_INDEX_PATH", os.path.join(".cache", "sparse_index.json"))
+
+# hybrid retrieval: dense + bm25 rankings fused into a capped top k
+FUSION_METHOD = os.environ.get("FUSION_METHOD", "rrf")  # rrf | weighted
+FUSION_TOP_K = env_int("FUSION_TOP_K", 5)
+RRF_K = env_int("RRF_K", 60)
+RETRIEVAL_FETCH_MULTIPLIER = env_int("RETRIEVAL_FETCH_MULTIPLIER", 3)  # each source fetches top_k * this
+
+# structured pre-scoring (skill overlap, experience fit, certifications) before the dense retrieval
+PRESCORE_KEEP = env_int("PRESCORE_KEEP", 100)  # best pre-scored candidates kept per job, 0 keeps everyone
+PRESCORE_MUST_HAVE_WEIGHT = env_float("PRESCORE_MUST_HAVE_WEIGHT", 3.0)
+PRESCORE_IMPORTANT_WEIGHT = env_float("PRESCORE_IMPORTANT_WEIGHT", 2.0)
+PRESCORE_NICE_TO_HAVE_WEIGHT = env_float("PRESCORE_NICE_TO_HAVE_WEIGHT", 1.0)
+PRESCORE_SKILL_WEIGHT = env_float("PRESCORE_SKILL_WEIGHT", 0.6)
+PRESCORE_EXPERIENCE_WEIGHT = env_float("PRESCORE_EXPERIENCE_WEIGHT", 0.3)
+PRESCORE_CERTIFICATION_WEIGHT = env_float("PRESCORE_CERTIFICATION_WEIGHT", 0.1)
+
+# cpu re-ranking of the retrieved pool before the llm: cosine re-score on the cached vectors,
+# or a local cross-encoder (needs sentence-transformers)
+RERANKER = os.environ.get("RERANKER", "cosine")  # cosine | cross-encoder | none
+RERANK_POOL_SIZE = env_int("RERANK_POOL_SIZE", 30)  # retrieved for the single ranking call, re-ranked to its top k
+RERANK_KEEP = env_int("RERANK_KEEP", 20)  # of the map-reduce pool, sent to the llm
+RERANK_MODEL = os.environ.get("RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+RERANK_BATCH_SIZE = env_int("RERANK_BATCH_SIZE", 32)
+RERANK_DENSE_WEIGHT = env_float("RERANK_DENSE_WEIGHT", 0.5)
+RERANK_SPARSE_WEIGHT = env_float("RERANK_SPARSE_WEIGHT", 0.2)
+RERANK_PRESCORE_WEIGHT = env_float("RERANK_PRESCORE_WEIGHT", 0.3)
+
+# llm ranking: one call over the fused top k, or map-reduce over a larger pool
+RANKING_MODE = os.environ.get("RANKING_MODE", "single")  # single | map-reduce
+RANKING_BATCH_SIZE = env_int("RANKING_BATCH_SIZE", 10)
+RANKING_KEEP_PER_BATCH = env_int("RANKING_KEEP_PER_BATCH", 3)
+MAP_REDUCE_POOL_SIZE = env_int("MAP_REDUCE_POOL_SIZE", 200)
+
+# embeddings: batched, parallel and cached on disk
+EMBEDDING_MODEL = os.environ.get("EMBEDDING_MODEL", "gemini-embedding-001")
+EMBEDDING_BATCH_SIZE = env_int("EMBEDDING_BATCH_SIZE", 100)
+EMBEDDING_MAX_WORKERS = env_int("EMBEDDING_MAX_WORKERS", 4)
+EMBEDDING_CACHE_PATH = os.environ.get("EMBEDDING_CACHE_PATH", os.path.join(".cache", "embeddings.sqlite"))
+EMBEDDING_CACHE_MAX_MB = env_int("EMBEDDING_CACHE_MAX_MB", 512)
+EMBEDDING_CACHE_DTYPE = os.environ.get("EMBEDDING_CACHE_DTYPE", "float16")  # float32 | float16 | int8
+
+# candidate pdf reports: built on a background process pool as soon as a ranking is shown,
+# kept in memory per candidate id and ranking version (REPORT_CACHE_SIZE reports)
+REPORT_WORKERS = env_int("REPORT_WORKERS", 4)
+REPORT_CACHE_SIZE = env_int("REPORT_CACHE_SIZE", 500)
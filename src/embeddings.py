@@ -0,0 +1,107 @@
+# embedding layer: batched and parallel embed calls, with a persistent cache of the vectors
+
+import base64
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from src import config
+from src.cache import DiskCache, text_hash
+from src.concurrency import call_with_retry, bounded_map
+from src.metrics import metrics
+
+
+# compact storage of a vector in the cache: float16 halves it, int8 (with a per-vector scale) quarters it
+def encode_vector(vector, dtype="float16"):
+    vector = np.asarray(vector, dtype=np.float32)
+    if dtype == "int8":
+        scale = float(np.abs(vector).max()) / 127 or 1.0
+        data = np.round(vector / scale).astype(np.int8)
+        return {"dtype": "int8", "scale": scale, "data": base64.b64encode(data.tobytes()).decode()}
+    data = vector.astype(np.float16 if dtype == "float16" else np.float32)
+    return {"dtype": dtype, "data": base64.b64encode(data.tobytes()).decode()}
+
+
+def decode_vector(payload):
+    raw = base64.b64decode(payload["data"])
+    if payload["dtype"] == "int8":
+        return (np.frombuffer(raw, dtype=np.int8).astype(np.float32) * payload["scale"]).tolist()
+    dtype = np.float16 if payload["dtype"] == "float16" else np.float32
+    return np.frombuffer(raw, dtype=dtype).astype(np.float32).tolist()
+
+
+class EmbeddingCache(DiskCache):
+    """Vectors keyed by the text hash plus the model and task type that produced them."""
+
+    name = "embedding"
+
+    def __init__(self, path=None, max_bytes=None):
+        super().__init__(
+            path or config.EMBEDDING_CACHE_PATH,
+            max_bytes if max_bytes is not None else config.EMBEDDING_CACHE_MAX_MB * 1024 * 1024,
+        )
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Wraps an embeddings client: texts are de-duplicated, looked up in the cache, and only the missing
+    ones are embedded, in batches of `batch_size` with up to `max_workers` batches in flight.
+    New vectors are stored in the cache as `dtype` (float32, float16 or int8), so identical candidate
+    texts are never embedded twice, across runs too.
+    """
+
+    def __init__(self, embeddings, cache=None, model=None, task_type=None,
+                 batch_size=None, max_workers=None, dtype=None):
+        self.embeddings = embeddings
+        self.cache = cache
+        self.model = model or getattr(embeddings, "model", type(embeddings).__name__)
+        self.task_type = task_type or getattr(embeddings, "task_type", None) or "default"
+        self.batch_size = batch_size or config.EMBEDDING_BATCH_SIZE
+        self.max_workers = max_workers or config.EMBEDDING_MAX_WORKERS
+        self.dtype = dtype or config.EMBEDDING_CACHE_DTYPE
+        self.embedded = 0  # texts actually sent to the model
+
+    def key(self, text, kind="document"):
+        return f"{self.model}:{self.task_type}:{kind}:{text_hash(text)}"
+
+    def _embed_batch(self, batch):
+        with metrics.stage("embedding"):
+            vectors = call_with_retry(self.embeddings.embed_documents, batch,
+                                      max_retries=config.LLM_MAX_RETRIES, base_delay=config.LLM_RETRY_BASE_DELAY)
+        metrics.incr("embedding_calls")
+        metrics.incr("embedded_texts", len(batch))
+        return vectors
+
+    def embed_documents(self, texts):
+        texts = list(texts)
+        unique = list(dict.fromkeys(texts))
+        keys = {text: self.key(text) for text in unique}
+        cached = self.cache.get_many(keys.values()) if self.cache is not None else {}
+        vectors = {text: decode_vector(cached[keys[text]]) for text in unique if keys[text] in cached}
+
+        missing = [text for text in unique if text not in vectors]
+        if missing:
+            batches = [missing[i:i + self.batch_size] for i in range(0, len(missing), self.batch_size)]
+            results = bounded_map(self._embed_batch, batches, max_workers=self.max_workers)
+            new_vectors = dict(zip(missing, (vector for batch in results for vector in batch)))
+            self.embedded += len(missing)
+            if self.cache is not None:
+                self.cache.set_many({keys[text]: encode_vector(v, self.dtype) for text, v in new_vectors.items()})
+            vectors.update({text: list(map(float, v)) for text, v in new_vectors.items()})
+
+        return [vectors[text] for text in texts]
+
+    def embed_query(self, text):
+        key = self.key(text, kind="query")
+        cached = self.cache.get(key) if self.cache is not None else None
+        if cached is not None:
+            return decode_vector(cached)
+        with metrics.stage("query_embedding"):
+            vector = call_with_retry(self.embeddings.embed_query, text,
+                                     max_retries=config.LLM_MAX_RETRIES, base_delay=config.LLM_RETRY_BASE_DELAY)
+        self.embedded += 1
+        metrics.incr("embedding_calls")
+        metrics.incr("embedded_texts")
+        if self.cache is not None:
+            self.cache.set(key, encode_vector(vector, self.dtype))
+        return list(map(float, vector))
@@ -0,0 +1,425 @@
+# long-lived candidate matching pipeline, shared by the streamlit apps and the local service
+
+import contextlib
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from langchain_core.documents import Document
+from langchain_core.output_parsers import JsonOutputParser
+from langchain_google_genai import ChatGoogleGenerativeAI
+
+from embed import connecting_vectordb, loading_sparse_index
+from src import config
+from src.cache import ExtractionCache, QueryCache, candidate_set_version, extraction_version, text_hash
+from src.candidates import CandidateStore
+from src.functions import (
+    embedding_model, load_pdf_files, pdf_paths, filter_to_minimal_docs,
+    resume_features_extraction, resume_to_text, jobpost_feature_extraction, jobposts_feature_extraction,
+    job_post_to_text
+)
+from src.fusion import metadata_prefilter, fuse_candidates
+from src.ingestion import IngestionWorker, chunked
+from src.metrics import metrics, UsageCallback
+from src.multivector import FieldIndex
+from src.prompts import (
+    resume_prompt, job_post_prompt, candidate_matching_prompt, candidate_scoring_prompt, ranking_parser
+)
+from src.concurrency import ReadWriteLock, bounded_map
+from src.ranking import parse_scores, rank_candidates, rank_candidates_map_reduce, stream_rank_candidates
+from src.prescoring import CandidateFeatures
+from src.reranking import make_reranker, rerank
+from src.screening import screen
+from src.utils import clean_text
+from src.vectorstore import LocalVectorStore, sync_documents
+
+
+class MatchingEngine:
+    """
+    Holds the llm clients, the embeddings client, the vector store and the bm25 index for the lifetime
+    of the process, so a query only pays for its own llm/embedding calls. Meant to be created once
+    (st.cache_resource in the apps, or the local service) and shared by concurrent users.
+
+    The warm indexes hold every candidate ingested so far; each query is restricted to the candidate ids
+    of its own upload, so recruiters screening different pools do not see each other's candidates.
+    Index updates (ingest, background ingestion) take the write side of a reader/writer lock, retrieval
+    and re-ranking the read side: searches run concurrently with each other, never during an update.
+
+    Every component can be passed in instead of being created from the config (e.g. offline
+    stand-ins in the benchmarks); an `llm` given here is used whatever the temperature.
+    """
+
+    def __init__(self, backend=None, embeddings=None, vectorstore=None, sparse_index=None,
+                 extraction_cache=None, llm=None, candidate_store=None, reranker=None, query_cache=None,
+                 field_index=None):
+        self.backend = backend or config.VECTOR_BACKEND
+        self.parser = JsonOutputParser()
+        self.extraction_cache = extraction_cache if extraction_cache is not None else ExtractionCache()
+        self.embeddings = embeddings if embeddings is not None else embedding_model()
+        self.vectorstore = vectorstore if vectorstore is not None else connecting_vectordb(
+            self.embeddings, mode="incremental", backend=self.backend
+        )
+        self.sparse_index = sparse_index if sparse_index is not None else loading_sparse_index()
+        self.candidate_store = candidate_store if candidate_store is not None else CandidateStore()
+        if field_index is None and config.MULTIVECTOR_MODE != "off":
+            field_index = FieldIndex.load(config.FIELD_INDEX_PATH) or FieldIndex()
+        self.field_index = field_index
+        self.reranker = reranker if reranker is not None else make_reranker(
+            self.vectorstore, self.embeddings, field_index=self.field_index
+        )
+        if query_cache is None and config.QUERY_CACHE_ENABLED:
+            query_cache = QueryCache()
+        self.query_cache = query_cache
+        self.index_lock = ReadWriteLock()   # vector store, bm25 and field index
+        self._llm = llm
+        self._llms = {}
+        self._llm_lock = threading.Lock()
+        self._features = None    # (candidate ids, CandidateFeatures) of the last pool
+        self._features_lock = threading.Lock()
+
+    def llm(self, temperature=0.7):
+        if self._llm is not None:
+            return self._llm
+        # one client per temperature, reused across queries (keeps its http connections open)
+        with self._llm_lock:
+            if temperature not in self._llms:
+                self._llms[temperature] = ChatGoogleGenerativeAI(
+                    model="gemini-2.5-flash",
+                    temperature=temperature,
+                    google_api_key=os.environ["GEMINI_API_KEY"],
+                    callbacks=[UsageCallback(metrics)]  # llm calls and token usage
+                )
+            return self._llms[temperature]
+
+    @metrics.timed("ingest_directory")
+    def ingest_directory(self, directory, temperature=0.7, max_workers=None, progress=None, chunk_size=None,
+                         memory_limit_mb=None):
+        """
+        Load, extract and index every resume of the directory, `chunk_size` files at a time (see
+        ingestion.chunked for the memory ceiling), so only one chunk of pages, cleaned texts and
+        candidates is alive at once whatever the size of the upload. Returns light candidate documents
+        (metadata only, their texts stay in the candidate store and are loaded for the shortlist).
+        `progress(done, total, doc)` is called as each resume extraction completes.
+        """
+        paths = pdf_paths(directory)
+        candidates = []
+        pdf_workers = min(config.PDF_LOAD_WORKERS, len(paths))
+        with contextlib.ExitStack() as stack:
+            executor = stack.enter_context(ProcessPoolExecutor(max_workers=pdf_workers)) if pdf_workers > 1 else None
+            min_chunk = max_workers or config.EXTRACTION_MAX_WORKERS   # every extraction worker stays busy
+            for chunk in chunked(paths, chunk_size, memory_limit_mb, min_size=min_chunk):
+                done = len(candidates)
+                chunk_progress = progress and (lambda n, total, doc: progress(done + n, len(paths), doc))
+                filtered_resume = filter_to_minimal_docs(load_pdf_files(chunk, executor))
+                resume_extraction = self.ingest(filtered_resume, temperature=temperature, max_workers=max_workers,
+                                                progress=chunk_progress, save=False)
+                candidates += self.candidate_store.documents(
+                    [doc.metadata["vector_id"] for doc in resume_extraction], text=False
+                )
+                del filtered_resume, resume_extraction
+        with self.index_lock.write():
+            self.save()
+        return candidates
+
+    def watch(self, directory, **kwargs):
+        """Start a background IngestionWorker keeping the indexes current with `directory`, returns it."""
+        return IngestionWorker(self, directory, **kwargs).start()
+
+    @metrics.timed("ingest")
+    def ingest(self, resume_docs, temperature=0.7, max_workers=None, progress=None, save=True):
+        resume_extraction = resume_features_extraction(
+            resume_docs, self.llm(temperature), clean_text, resume_prompt, resume_to_text, self.parser,
+            max_workers=max_workers, cache=self.extraction_cache, progress=progress, store=self.candidate_store
+        )
+        with self.index_lock.write():
+            sync_documents(self.vectorstore, resume_extraction, delete_missing=False)
+            self.sparse_index.sync(resume_extraction, delete_missing=False)
+            if self.field_index is not None:
+                resume_jsons = self.candidate_store.resume_jsons(doc.metadata["vector_id"] for doc in resume_extraction)
+                self.field_index.sync(resume_extraction, resume_jsons, self.embeddings)
+            if save:
+                self.save()
+        return resume_extraction
+
+    def remove(self, vector_ids):
+        """Drop candidates from every index and from the candidate store (a resume replaced or deleted)."""
+        vector_ids = sorted(set(vector_ids))
+        if not vector_ids:
+            return
+        with self.index_lock.write():
+            self.vectorstore.delete(ids=vector_ids)
+            for vector_id in vector_ids:
+                self.sparse_index.remove(vector_id)
+            if self.field_index is not None:
+                self.field_index.remove(vector_ids)
+            self.save()
+        self.candidate_store.delete(vector_ids)
+        metrics.incr("candidates_removed", len(vector_ids))
+
+    @metrics.timed("index_save")
+    def save(self):
+        if isinstance(self.vectorstore, LocalVectorStore):
+            self.vectorstore.save(config.LOCAL_INDEX_PATH)
+        self.sparse_index.save(config.SPARSE_INDEX_PATH)
+        if self.field_index is not None:
+            self.field_index.save(config.FIELD_INDEX_PATH)
+
+    def cached(self, key, compute, encode=lambda value: value, decode=lambda value: value):
+        # query cache lookup, compute() and store on a miss (always compute without a query cache)
+        if self.query_cache is None:
+            return compute()
+        value = self.query_cache.get(key)
+        if value is not None:
+            return decode(value)
+        value = compute()
+        self.query_cache.set(key, encode(value))
+        return value
+
+    @staticmethod
+    def job_hash(job_description_input):
+        # the same job description pasted again, with other spacing, case or markup, hashes the same
+        return text_hash(" ".join(clean_text(job_description_input).lower().split()))
+
+    def process_job(self, job_description_input, temperature=0.7):
+        llm = self.llm(temperature)
+        return self.cached(
+            QueryCache.key("job", self.job_hash(job_description_input), extraction_version(job_post_prompt, llm)),
+            lambda: jobpost_feature_extraction(
+                job_description_input, llm, clean_text, job_post_prompt, job_post_to_text, self.parser
+            ),
+            encode=lambda doc: {"page_content": doc.page_content, "metadata": doc.metadata},
+            decode=lambda value: Document(**value),
+        )
+
+    def retrieve(self, job_description_doc, candidates, top_k=5):
+        """
+        Hybrid retrieval restricted to `candidates`: metadata pre-filter, structured pre-scoring,
+        dense + bm25 search, rank fusion.
+        """
+        job_description = job_description_doc.page_content
+        candidates_by_id = {doc.metadata["vector_id"]: doc for doc in candidates}
+        fetch_k = top_k * config.RETRIEVAL_FETCH_MULTIPLIER
+
+        # Metadata Filtering, used as a cheap pre-filter on minimum years of experience
+        allowed_ids = metadata_prefilter(candidates, job_description_doc.metadata["experience_required"])
+
+        # Structured pre-scoring (skills, experience, certifications), only the best PRESCORE_KEEP go on
+        keep = max(config.PRESCORE_KEEP, fetch_k) if config.PRESCORE_KEEP > 0 else 0
+        allowed_ids, prescores = self.candidate_features(candidates).shortlist(job_description_doc, keep, allowed_ids)
+
+        # Dense Retrievel (Semantic Search), only over the allowed candidates: field by field when every
+        # one of them has field vectors (MULTIVECTOR_MODE, stored candidates missing them are embedded
+        # first), else one vector per resume
+        if self.field_index is not None:
+            self.index_fields(allowed_ids)
+        with metrics.stage("dense_search"):
+            if self.field_index is not None and all(i in self.field_index for i in allowed_ids):
+                query = self.field_index.query_vectors(job_description_doc, self.embeddings)
+                dense_results = [(candidates_by_id[i], score)
+                                 for i, score in self.field_index.search(query, sorted(allowed_ids), fetch_k)]
+            else:
+                dense_results = self.vectorstore.similarity_search_with_score(
+                    job_description, k=fetch_k, filter={"vector_id": {"$in": sorted(allowed_ids)}}
+                )
+
+        # Sparse Retrievel (Keyword Search) over the persistent bm25 index
+        sparse_results = self.sparse_index.search(job_description, k=fetch_k, allowed_ids=allowed_ids)
+
+        # Fusing both rankings (reciprocal rank fusion by default) into the candidate pool
+        with metrics.stage("fusion"):
+            fused = fuse_candidates(
+                dense_results, sparse_results, candidates_by_id, top_k=top_k, allowed_ids=allowed_ids,
+                method=config.FUSION_METHOD, rrf_k=config.RRF_K
+            )
+        for doc in fused:
+            doc.metadata["retrieval_scores"]["prescore"] = prescores.get(doc.metadata["vector_id"])
+        return self.candidate_store.hydrate(fused)  # texts of light talent pool documents, shortlist only
+
+    def index_fields(self, vector_ids, batch_size=256):
+        """
+        Field vectors (MULTIVECTOR_MODE) of the stored candidates of `vector_ids` that have none yet,
+        e.g. candidates ingested before the mode was turned on. Returns the number added.
+        """
+        missing = [i for i in vector_ids if i not in self.field_index]
+        added = 0
+        for start in range(0, len(missing), batch_size):
+            resume_jsons = self.candidate_store.resume_jsons(missing[start:start + batch_size])
+            added += self.field_index.add(resume_jsons, self.embeddings)
+        if added:
+            self.field_index.save(config.FIELD_INDEX_PATH)
+            metrics.incr("field_index_backfilled", added)
+        return added
+
+    def talent_pool(self, min_experience=None, all_skills=None, any_skills=None, limit=None):
+        """Light documents of every stored candidate matching the filters, see CandidateStore.query."""
+        return self.candidate_store.query(min_experience=min_experience, all_skills=all_skills,
+                                          any_skills=any_skills, limit=limit)
+
+    def shortlist(self, job_description_doc, candidates, top_k=5, ranking_mode="single"):
+        """
+        The candidates sent to the llm ranking: hybrid retrieval of a wider pool, re-ranked on the cpu
+        (see reranking.py) down to the top_k for the single ranking call, or RERANK_KEEP for map-reduce.
+        Without a reranker the retrieval pool goes to the llm as it is.
+        Cached per job, candidate set version and settings, so a repeated query skips retrieval.
+        """
+        candidates_by_id = {doc.metadata["vector_id"]: doc for doc in candidates}
+        key = QueryCache.key("shortlist", job_description_doc.page_content, candidate_set_version(candidates),
+                             top_k, ranking_mode, self.retrieval_settings())
+        return self.cached(
+            key, lambda: self._shortlist(job_description_doc, candidates, top_k, ranking_mode),
+            encode=lambda docs: [[doc.metadata["vector_id"], doc.metadata["retrieval_scores"]] for doc in docs],
+            decode=lambda entries: self.candidate_store.hydrate([
+                Document(page_content=candidates_by_id[i].page_content,
+                         metadata={**candidates_by_id[i].metadata, "retrieval_scores": scores})
+                for i, scores in entries
+            ]),
+        )
+
+    @staticmethod
+    def retrieval_settings():
+        # the settings a cached shortlist depends on, besides the job and the candidate set
+        names = ("FUSION_METHOD", "RRF_K", "RETRIEVAL_FETCH_MULTIPLIER", "PRESCORE_KEEP", "PRESCORE_MUST_HAVE_WEIGHT",
+                 "PRESCORE_IMPORTANT_WEIGHT", "PRESCORE_NICE_TO_HAVE_WEIGHT", "PRESCORE_SKILL_WEIGHT",
+                 "PRESCORE_EXPERIENCE_WEIGHT", "PRESCORE_CERTIFICATION_WEIGHT", "RERANKER", "RERANK_POOL_SIZE",
+                 "RERANK_KEEP", "RERANK_MODEL", "RERANK_DENSE_WEIGHT", "RERANK_SPARSE_WEIGHT",
+                 "RERANK_PRESCORE_WEIGHT", "MAP_REDUCE_POOL_SIZE", "EMBEDDING_MODEL", "MULTIVECTOR_MODE",
+                 "FIELD_EMBEDDING_DIM", "MULTIVECTOR_SKILLS_WEIGHT", "MULTIVECTOR_EXPERIENCE_WEIGHT",
+                 "MULTIVECTOR_PROJECTS_WEIGHT", "MULTIVECTOR_SUMMARY_WEIGHT")
+        return ",".join(f"{name}={getattr(config, name)}" for name in names)
+
+    def _shortlist(self, job_description_doc, candidates, top_k, ranking_mode):
+        pool_size = config.MAP_REDUCE_POOL_SIZE if ranking_mode == "map-reduce" else top_k
+        with self.index_lock.read():
+            if self.reranker is None:
+                return self.retrieve(job_description_doc, candidates, top_k=pool_size)
+            if ranking_mode == "map-reduce":
+                keep = max(config.RERANK_KEEP, top_k)
+            else:
+                keep, pool_size = top_k, max(config.RERANK_POOL_SIZE, top_k)
+            pool = self.retrieve(job_description_doc, candidates, top_k=pool_size)
+            return rerank(self.reranker, job_description_doc, pool, keep)
+
+    def candidate_features(self, candidates):
+        """CandidateFeatures of the pool, rebuilt only when the pool changes (every query of an upload reuses it)."""
+        ids = tuple(doc.metadata["vector_id"] for doc in candidates)
+        with self._features_lock:
+            if self._features is None or self._features[0] != ids:
+                self._features = (ids, CandidateFeatures(candidates))
+            return self._features[1]
+
+    def ranking_key(self, kind, candidates, job_description, llm, prompt, *parts):
+        # ranking results depend on the job, the exact candidates sent, the prompt/model and the call settings
+        return QueryCache.key(kind, job_description, candidate_set_version(candidates),
+                              extraction_version(prompt, llm), *parts)
+
+    @metrics.timed("ranking")
+    def rank(self, candidates, job_description, ranking_mode="single", top_k=5, temperature=0.7):
+        llm = self.llm(temperature)
+        if ranking_mode == "map-reduce":
+            # scoring in parallel batches, the best of each batch re-ranked together
+            return self.cached(
+                self.ranking_key("ranking", candidates, job_description, llm, candidate_scoring_prompt,
+                                 ranking_mode, top_k, temperature),
+                lambda: rank_candidates_map_reduce(
+                    candidates, job_description, llm, candidate_scoring_prompt, ranking_parser, top_k=top_k
+                ),
+            )
+        return self.cached(
+            self.ranking_key("ranking", candidates, job_description, llm, candidate_matching_prompt, "single", temperature),
+            lambda: rank_candidates(candidates, job_description, llm, candidate_matching_prompt, ranking_parser),
+        )[:top_k]
+
+    def rank_stream(self, candidates, job_description, temperature=0.7):
+        """
+        Single-call ranking streamed as partially parsed json, see ranking.stream_rank_candidates.
+        A cached ranking (same key as rank in single mode) is yielded at once as {"candidates": records}.
+        """
+        llm = self.llm(temperature)
+        key = self.ranking_key("ranking", candidates, job_description, llm, candidate_matching_prompt, "single", temperature)
+        records = self.query_cache.get(key) if self.query_cache is not None else None
+        if records is not None:
+            yield {"candidates": records}
+            return
+        with metrics.stage("ranking"):
+            response = {}
+            for response in stream_rank_candidates(
+                candidates, job_description, llm, candidate_matching_prompt, ranking_parser
+            ):
+                yield response
+        if self.query_cache is not None and response:
+            self.query_cache.set(key, parse_scores(response, candidates))
+
+    def match(self, job_description_input, candidates=None, top_k=5, ranking_mode="single", temperature=0.7):
+        """
+        Full screening of `candidates` against one job description, returns records and retrieval scores.
+        Without candidates the whole stored talent pool with the required experience is screened.
+        """
+        job_description_doc = self.process_job(job_description_input, temperature)
+        if candidates is None:
+            candidates = self.talent_pool(min_experience=job_description_doc.metadata["experience_required"]) \
+                or self.talent_pool()
+        unique_docs = self.shortlist(job_description_doc, candidates, top_k, ranking_mode)
+        records = self.rank(unique_docs, job_description_doc.page_content, ranking_mode, top_k, temperature)
+        return {
+            "records": records,
+            "retrieval_scores": [
+                {"name": doc.metadata["name"], **doc.metadata["retrieval_scores"]} for doc in unique_docs
+            ],
+        }
+
+    def process_jobs(self, job_posts, temperature=0.7, requests_per_minute=None):
+        """
+        Every posting of every job post, extracted concurrently (see functions.jobposts_feature_extraction),
+        limited to `requests_per_minute` (LLM_REQUESTS_PER_MINUTE by default, 0 for no limit).
+        """
+        return jobposts_feature_extraction(
+            job_posts, self.llm(temperature), clean_text, job_post_prompt, job_post_to_text, self.parser,
+            requests_per_minute=requests_per_minute
+        )
+
+    @metrics.timed("screening")
+    def screen_jobs(self, job_posts, candidates, top_k=5, rank=True, temperature=0.7, requests_per_minute=None):
+        """
+        Bulk screening of `candidates` against many job posts: the posts are extracted concurrently,
+        retrieval scores the whole (postings x candidates) matrix at once, each posting's pool is re-ranked
+        on the cpu like a single query's (see _shortlist), and when `rank` is set the shortlists are ranked
+        by the llm in parallel. Returns one entry per posting:
+        {"job": {requisition, posting, role, experience_required, text}, "shortlist": [...], "records": [...]}
+        `requests_per_minute` limits the job extraction calls, see process_jobs.
+        """
+        job_docs = self.process_jobs(job_posts, temperature, requests_per_minute)
+        # the same pool as the single ranking call of _shortlist: RERANK_POOL_SIZE retrieved, re-ranked to top_k
+        pool_size = top_k if self.reranker is None else max(config.RERANK_POOL_SIZE, top_k)
+        with self.index_lock.read():
+            if self.field_index is not None:
+                self.index_fields([doc.metadata["vector_id"] for doc in candidates])   # stored before MULTIVECTOR_MODE
+            shortlists = screen(job_docs, candidates, self.vectorstore, self.embeddings, self.sparse_index,
+                                top_k=pool_size, texts=self.candidate_store.texts, field_index=self.field_index)
+            if self.reranker is not None:
+                # texts of light candidates first, as the single-query retrieval hydrates its pool
+                self.candidate_store.hydrate([doc for pool in shortlists for doc in pool])
+                shortlists = [rerank(self.reranker, job_doc, pool, top_k) for job_doc, pool in zip(job_docs, shortlists)]
+        if rank:
+            # texts of light candidates (ingest_directory, talent pool) for the llm, one query for all shortlists
+            self.candidate_store.hydrate([doc for shortlist in shortlists for doc in shortlist])
+
+        def ranked(index):
+            if not rank or not shortlists[index]:
+                return []
+            return self.rank(shortlists[index], job_docs[index].page_content, top_k=top_k, temperature=temperature)
+
+        records = bounded_map(ranked, range(len(job_docs)), max_workers=config.EXTRACTION_MAX_WORKERS)
+        return [
+            {
+                "job": {
+                    "requisition": doc.metadata["requisition"],
+                    "posting": doc.metadata["posting"],
+                    "role": doc.metadata["role"],
+                    "experience_required": doc.metadata["experience_required"],
+                    "text": doc.page_content,
+                },
+                "shortlist": [{"name": c.metadata["name"], **c.metadata["retrieval_scores"]} for c in shortlist],
+                "records": job_records,
+            }
+            for doc, shortlist, job_records in zip(job_docs, shortlists, records)
+        ]
@@ -1,18 +1,62 @@
+import glob
 import os
+from concurrent.futures import ProcessPoolExecutor
 from langchain_community.document_loaders import PyPDFLoader, DirectoryLoader
 from langchain_google_genai import GoogleGenerativeAIEmbeddings
 from typing import List
 from langchain_core.documents import Document
+from src import config
+from src.concurrency import TokenBucket, call_with_retry, bounded_map
+from src.cache import extraction_version, source_hash
+from src.metrics import metrics
+from src.utils import clean_texts
+from src.embeddings import CachedEmbeddings, EmbeddingCache
+from src.vectorstore import content_id
 
 
 # loading all the resumes
-def load_pdf_file(data):
-    loader = DirectoryLoader(data,
-                             glob="*.pdf",
-                             loader_cls=PyPDFLoader)
+@metrics.timed("load_pdf")
+def load_pdf_file(data, per_file=False, max_workers=None):
+    """
+    Load every pdf of the `data` directory.
+    By default one Document is returned per page. With per_file=True the pages of each resume are merged
+    into a single Document (so a resume costs one extraction call and becomes one candidate), and the
+    files are parsed in parallel on a process pool of `max_workers` processes.
+    """
+    if not per_file:
+        loader = DirectoryLoader(data,
+                                 glob="*.pdf",
+                                 loader_cls=PyPDFLoader)
+
+        documents = loader.load()
+        return documents
+
+    paths = pdf_paths(data)
+    max_workers = max_workers or config.PDF_LOAD_WORKERS
+    if max_workers <= 1 or len(paths) <= 1:
+        return load_pdf_files(paths)
+    with ProcessPoolExecutor(max_workers=min(max_workers, len(paths))) as executor:
+        return load_pdf_files(paths, executor)
 
-    documents = loader.load()
-    return documents
+
+def pdf_paths(data):
+    return sorted(glob.glob(os.path.join(data, "*.pdf")))
+
+
+# one document per resume file, parsed on the executor's worker processes when one is given
+def load_pdf_files(paths, executor=None):
+    if executor is None:
+        return [load_single_pdf(path) for path in paths]
+    return list(executor.map(load_single_pdf, paths))
+
+
+# one resume file -> one document, pages joined in order (runs in a worker process)
+def load_single_pdf(path):
+    pages = PyPDFLoader(path).load()
+    return Document(
+        page_content="\n".join(page.page_content for page in pages),
+        metadata={"source": path, "total_pages": len(pages)}
+    )
 
 
 # filter out the relevant metadata from the loaded resumes
@@ -49,17 +93,70 @@ def resume_to_text(resume_json):
 
 # extracting key features from each resumes (resume -> Json -> text)
 
-def resume_features_extraction(docs,llm_model,resume_cleaner,prompt_template,resume_to_text,parser):
-    all_candidates = []
-    count=1
-    for doc in docs: # each doc represents a resume document, docs is collection of resume documents in a list
-        clean_resume = resume_cleaner(doc.page_content)  # clean the resume in nice format (funtion defined in util.py)
-        chain = prompt_template | llm_model | parser     # langchain chain expression
-        resume_json = chain.invoke({'resume_data':clean_resume}) # give the keys features for each candidate in json form 
+def resume_features_extraction(docs,llm_model,resume_cleaner,prompt_template,resume_to_text,parser,
+                               max_workers=None,requests_per_minute=None,max_retries=None,cache=None,progress=None,store=None):
+    """
+    Extract the key features of every resume with the llm.
+    Calls run on a bounded pool of `max_workers` threads, limited to `requests_per_minute`
+    by a token bucket and retried with backoff on 429/5xx. Candidate ids follow the order
+    of `docs`, so they are the same whichever call finishes first.
+    When an ExtractionCache is given, resumes already extracted with the same prompt and model
+    are served from it and never reach the llm.
+    `progress(done, total, doc)` is called as each resume finishes, in completion order.
+    Every candidate gets its content id as metadata["id"] and ["vector_id"], the same across runs;
+    with a CandidateStore the candidates are also saved with their resume json and source hash.
+    """
+    max_workers = config.EXTRACTION_MAX_WORKERS if max_workers is None else max_workers
+    requests_per_minute = config.LLM_REQUESTS_PER_MINUTE if requests_per_minute is None else requests_per_minute
+    max_retries = config.LLM_MAX_RETRIES if max_retries is None else max_retries
+
+    chain = prompt_template | llm_model | parser     # langchain chain expression, built once for all resumes
+    rate_limiter = TokenBucket.per_minute(requests_per_minute) if requests_per_minute else None
+    version = extraction_version(prompt_template, llm_model)
+
+    docs = list(docs)
+
+    # resumes already extracted are looked up in one go, the others are cleaned in one batch
+    # (spread over a process pool for large uploads) before their llm calls start
+    keys = [cache.key_for(doc, version) for doc in docs] if cache is not None else [None] * len(docs)
+    cached = cache.get_many(keys) if cache is not None else {}
+    missing = [i for i, key in enumerate(keys) if key not in cached]
+    with metrics.stage("clean_text"):
+        # clean the resume in nice format (funtion defined in util.py)
+        clean_resumes = dict(zip(missing, clean_texts([docs[i].page_content for i in missing], cleaner=resume_cleaner)))
+
+    def extract(index): # each index points to a resume document
+        if index not in clean_resumes:
+            return cached[keys[index]]['resume_json'], cached[keys[index]]['resume_text']
+
+        with metrics.stage("llm_extraction"):
+            resume_json = call_with_retry(
+                chain.invoke, {'resume_data':clean_resumes[index]}, # give the keys features for each candidate in json form
+                max_retries=max_retries, base_delay=config.LLM_RETRY_BASE_DELAY, rate_limiter=rate_limiter
+            )
         resume_text = resume_to_text(resume_json) # convert json format into regular text with function json to text
-        document_resume = Document(metadata={"id":count,"name":resume_json['name'],"experience":resume_json['experience_years'],"skills":resume_json['skills']},page_content=resume_text)   # convert into each resume into document form for embedding
+        if cache is not None:
+            cache.set(keys[index], {'resume_json':resume_json, 'resume_text':resume_text})
+        return resume_json, resume_text
+
+    done = []
+
+    def report(index, result):
+        done.append(index)
+        progress(len(done), len(docs), docs[index])
+
+    extracted = bounded_map(extract, range(len(docs)), max_workers=max_workers, on_result=report if progress else None)
+
+    all_candidates = []
+    for resume_json, resume_text in extracted:
+        document_resume = Document(metadata={"name":resume_json['name'],"experience":resume_json['experience_years'],"skills":resume_json['skills']},page_content=resume_text)   # convert into each resume into document form for embedding
+        document_resume.metadata["id"] = document_resume.metadata["vector_id"] = content_id(document_resume)
         all_candidates.append(document_resume)      # append each document resume in list
-        count+=1
+
+    if store is not None:
+        hashes = [cache.source_hash(doc) if cache is not None else source_hash(doc) for doc in docs]
+        store.upsert([(candidate, resume_json, hashes[i], docs[i].metadata.get("source"))
+                      for i, (candidate, (resume_json, _)) in enumerate(zip(all_candidates, extracted))])
     return all_candidates
 
 
@@ -87,26 +184,68 @@ Description:
 
 # extracting key features from job post
 
+@metrics.timed("job_extraction")
 def jobpost_feature_extraction(doc,llm_model,post_cleaner,prompt_template, job_post_to_text, parser):
     clean_post = post_cleaner(doc)
     chain = prompt_template | llm_model | parser
     post_json = chain.invoke({'job_post':clean_post})
-    print(post_json)
-    post_text = job_post_to_text(post_json['job_posting'][0])
-    document_post = Document(metadata={"experience_required":post_json['job_posting'][0]['experience_required'],"employment_type":post_json['job_posting'][0]['employment_type'],"posted_date":post_json['job_posting'][0]["posted_date"]},page_content=post_text)
-    print(type(post_json['job_posting'][0]['experience_required']))
+    document_post = job_post_documents(post_json, job_post_to_text)[0]
     return document_post
 
-# setting up the embedding model
 
-def embedding_model():
+# every posting of the extracted post_json as a document (one job post page can list several openings)
+def job_post_documents(post_json, job_post_to_text, requisition=None):
+    documents = []
+    for posting, job_json in enumerate(post_json['job_posting']):
+        metadata = {"experience_required":job_json['experience_required'],"employment_type":job_json['employment_type'],"posted_date":job_json["posted_date"],
+                    "skills":job_json.get('skills', []),"skill_classification":job_json.get('skill_classification', {}),
+                    "role":job_json.get('role'),"description":job_json.get('description')}
+        if requisition is not None:
+            metadata.update({"requisition":requisition,"posting":posting})
+        documents.append(Document(metadata=metadata,page_content=job_post_to_text(job_json)))
+    return documents
+
+
+# extracting key features from many job posts at once (bulk screening)
+
+@metrics.timed("jobs_extraction")
+def jobposts_feature_extraction(job_posts,llm_model,post_cleaner,prompt_template,job_post_to_text,parser,
+                                max_workers=None,requests_per_minute=None,max_retries=None):
+    """
+    Extract every job post of `job_posts` concurrently, same pool, rate limit and retries as the resumes.
+    Unlike jobpost_feature_extraction every posting found in a post is kept: the documents are returned
+    flattened, in input order, with metadata["requisition"] (index of the job post) and ["posting"].
+    """
+    max_workers = config.EXTRACTION_MAX_WORKERS if max_workers is None else max_workers
+    requests_per_minute = config.LLM_REQUESTS_PER_MINUTE if requests_per_minute is None else requests_per_minute
+    max_retries = config.LLM_MAX_RETRIES if max_retries is None else max_retries
+
+    chain = prompt_template | llm_model | parser
+    rate_limiter = TokenBucket.per_minute(requests_per_minute) if requests_per_minute else None
+    clean_posts = clean_texts(job_posts, cleaner=post_cleaner)
+
+    def extract(index):
+        with metrics.stage("llm_extraction"):
+            post_json = call_with_retry(
+                chain.invoke, {'job_post':clean_posts[index]},
+                max_retries=max_retries, base_delay=config.LLM_RETRY_BASE_DELAY, rate_limiter=rate_limiter
+            )
+        return job_post_documents(post_json, job_post_to_text, requisition=index)
+
+    extracted = bounded_map(extract, range(len(clean_posts)), max_workers=max_workers)
+    return [document for documents in extracted for document in documents]
+
+# setting up the embedding model (batched, parallel and cached on disk unless cached=False)
+
+def embedding_model(cached=True):
     embeddings =  GoogleGenerativeAIEmbeddings(
-        model="gemini-embedding-001",
+        model=config.EMBEDDING_MODEL,
         task_type="RETRIEVAL_DOCUMENT",
         google_api_key=os.environ["GEMINI_API_KEY"]
     )
+    if cached:
+        embeddings = CachedEmbeddings(
+            embeddings, cache=EmbeddingCache(), model=config.EMBEDDING_MODEL, task_type="RETRIEVAL_DOCUMENT"
+        )
 
     return embeddings
-
-
-
@@ -0,0 +1,131 @@
+# fusing the dense (vector) and sparse (bm25) rankings into one capped candidate list
+
+import numpy as np
+from langchain_core.documents import Document
+
+
+def as_number(value, default=0.0):
+    # llm extracted values can be "not available" or "2-5" instead of a number
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        try:
+            return float(str(value).split("-")[0].strip())
+        except ValueError:
+            return default
+
+
+def metadata_prefilter(candidates, experience_required, id_key="vector_id"):
+    """
+    Cheap pre-filter on the candidate metadata, returns the ids of the candidates with at least
+    the required experience. When nobody qualifies every candidate is kept, so ranking still has a pool.
+    """
+    required = as_number(experience_required)
+    allowed = {c.metadata[id_key] for c in candidates if as_number(c.metadata.get("experience")) >= required}
+    return allowed or {c.metadata[id_key] for c in candidates}
+
+
+def prefilter_mask(candidates, experience_required):
+    """
+    metadata_prefilter for many queries at once: boolean (queries x candidates) matrix of the candidates
+    with at least the experience each query requires (every candidate for a query nobody qualifies for).
+    """
+    experience = np.array([as_number(c.metadata.get("experience")) for c in candidates], dtype=np.float64)
+    required = np.array([as_number(r) for r in experience_required], dtype=np.float64)
+    mask = experience[None, :] >= required[:, None]
+    mask[~mask.any(axis=1)] = True
+    return mask
+
+
+def reciprocal_rank_fusion(rankings, k=60, weights=None):
+    """
+    rankings: {source: [id, ...] best first}. Returns {id: sum of weight / (k + rank)} over the sources.
+    """
+    fused = {}
+    for source, ids in rankings.items():
+        weight = (weights or {}).get(source, 1.0)
+        for rank, doc_id in enumerate(ids, start=1):
+            fused[doc_id] = fused.get(doc_id, 0.0) + weight / (k + rank)
+    return fused
+
+
+def weighted_score_fusion(scores, weights=None):
+    """
+    scores: {source: {id: raw score}}. Scores are min-max normalised per source, then summed with the weights.
+    """
+    fused = {}
+    for source, source_scores in scores.items():
+        if not source_scores:
+            continue
+        weight = (weights or {}).get(source, 1.0)
+        low, high = min(source_scores.values()), max(source_scores.values())
+        for doc_id, score in source_scores.items():
+            normalised = (score - low) / (high - low) if high > low else 1.0
+            fused[doc_id] = fused.get(doc_id, 0.0) + weight * normalised
+    return fused
+
+
+def fuse_candidates(dense_results, sparse_results, candidates, top_k=5, allowed_ids=None,
+                    method="rrf", weights=None, rrf_k=60, id_key="vector_id"):
+    """
+    Combine the dense results [(doc, score)] and sparse results [(id, score)] of the candidates {id: doc}.
+    Only ids in allowed_ids (metadata pre-filter) are kept, the best top_k by fused score are returned
+    as documents carrying their per-source scores in metadata["retrieval_scores"].
+    """
+    scores = {
+        "dense": {doc.metadata[id_key]: float(score) for doc, score in dense_results},
+        "sparse": {doc_id: float(score) for doc_id, score in sparse_results},
+    }
+    if allowed_ids is not None:
+        scores = {source: {i: s for i, s in source_scores.items() if i in allowed_ids}
+                  for source, source_scores in scores.items()}
+    scores = {source: {i: s for i, s in source_scores.items() if i in candidates}
+              for source, source_scores in scores.items()}
+
+    if method == "weighted":
+        fused = weighted_score_fusion(scores, weights)
+    else:
+        rankings = {source: sorted(source_scores, key=source_scores.get, reverse=True)
+                    for source, source_scores in scores.items()}
+        fused = reciprocal_rank_fusion(rankings, k=rrf_k, weights=weights)
+
+    ranked = sorted(fused, key=fused.get, reverse=True)[:top_k]
+    results = []
+    for doc_id in ranked:
+        doc = candidates[doc_id]
+        retrieval_scores = {source: source_scores.get(doc_id) for source, source_scores in scores.items()}
+        retrieval_scores["fused"] = fused[doc_id]
+        results.append(Document(page_content=doc.page_content,
+                                metadata={**doc.metadata, "retrieval_scores": retrieval_scores}))
+    return results
+
+
+def fuse_score_matrices(scores, mask=None, method="rrf", weights=None, rrf_k=60, fetch_k=None):
+    """
+    Vectorized fusion for many queries at once. scores: {source: (queries x candidates) matrix}, with
+    -inf (or 0 for sparse) where a candidate was not found. mask: boolean matrix of the candidates each
+    query may return (metadata pre-filter). Like fuse_candidates, only the first `fetch_k` of each
+    source take part in rrf, and weighted fusion min-max normalises every row.
+    Returns the (queries x candidates) fused matrix, -inf outside the mask.
+    """
+    shape = next(iter(scores.values())).shape
+    mask = np.ones(shape, dtype=bool) if mask is None else mask
+    fused = np.zeros(shape, dtype=np.float64)
+    for source, matrix in scores.items():
+        weight = (weights or {}).get(source, 1.0)
+        found = mask & np.isfinite(matrix) & (matrix > 0 if source == "sparse" else True)
+        values = np.where(found, matrix, -np.inf)
+        if method == "weighted":
+            low = np.where(found, values, np.inf).min(axis=1, keepdims=True)
+            high = values.max(axis=1, keepdims=True)
+            with np.errstate(invalid="ignore"):  # rows where the source found nothing
+                normalised = np.where(high > low, (values - low) / np.where(high > low, high - low, 1.0), 1.0)
+            fused += np.where(found, weight * normalised, 0.0)
+        else:
+            order = np.argsort(-values, axis=1, kind="stable")
+            ranks = np.empty_like(order)
+            np.put_along_axis(ranks, order, np.arange(1, shape[1] + 1)[None, :], axis=1)
+            if fetch_k is not None:
+                found &= ranks <= fetch_k
+            fused += np.where(found, weight / (rrf_k + ranks), 0.0)
+    return np.where(mask, fused, -np.inf)
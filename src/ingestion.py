@@ -0,0 +1,282 @@
+# background ingestion of a watched resumes folder, and temporary upload directories that clean up after themselves
+
+import contextlib
+import gc
+import os
+import queue
+import shutil
+import tempfile
+import threading
+import time
+
+import psutil
+
+from src import config
+from src.functions import load_single_pdf
+from src.metrics import metrics
+
+
+@contextlib.contextmanager
+def uploaded_directory(uploaded_files):
+    """Write uploaded files (objects with .name and .read()) into a temporary directory, removed on exit."""
+    directory = tempfile.mkdtemp(prefix="resumes_")
+    try:
+        for uploaded_file in uploaded_files:
+            with open(os.path.join(directory, os.path.basename(uploaded_file.name)), "wb") as f:
+                shutil.copyfileobj(uploaded_file, f, 1 << 20)   # 1 MB at a time, no second copy of the file
+        yield directory
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def memory_mb():
+    """Resident memory of the process in MB."""
+    return psutil.Process().memory_info().rss / 1024 / 1024
+
+
+def chunked(items, chunk_size=None, memory_limit_mb=None, min_size=1):
+    """
+    Generator of consecutive chunks of `items`, at most `chunk_size` long. Once the resident memory
+    has grown by more than `memory_limit_mb` since the first chunk (after a garbage collection) the
+    next chunks are halved, down to `min_size` items (the extraction workers, so they all stay busy);
+    they grow back once the growth is under three quarters of the limit. Growth rather than the total
+    keeps other sessions and uploads of a shared process (streamlit) from throttling this ingestion.
+    """
+    chunk_size = max(1, chunk_size or config.INGEST_CHUNK_SIZE)
+    min_size = max(1, min(min_size, chunk_size))
+    memory_limit_mb = config.INGEST_MEMORY_LIMIT_MB if memory_limit_mb is None else memory_limit_mb
+    size, start = chunk_size, 0
+    baseline = memory_mb() if memory_limit_mb > 0 else 0.0
+    while start < len(items):
+        if start and memory_limit_mb > 0:
+            used = memory_mb() - baseline
+            if used > memory_limit_mb and size > min_size:
+                gc.collect()   # reference cycles left by the previous chunk, only worth a full collection here
+                used = memory_mb() - baseline
+            if used > memory_limit_mb:
+                if size > min_size:
+                    size = max(min_size, size // 2)
+                    metrics.incr("ingest_memory_throttled")
+            elif used < 0.75 * memory_limit_mb:
+                size = min(chunk_size, size * 2)
+        yield items[start:start + size]
+        start += size
+
+
+def scan(directory, known, pending):
+    """
+    (ready, removed) paths of `directory`: the pdfs that are new or changed since they were ingested
+    (`known`: path -> (size, mtime)), and the known pdfs that are no longer there. A file is only
+    ready once its size and mtime did not change between two scans (`pending`, updated in place),
+    so files still being copied in are not picked up half written.
+    """
+    ready = []
+    try:
+        entries = sorted(os.scandir(directory), key=lambda entry: entry.name)
+    except FileNotFoundError:
+        return ready, []   # folder gone (or not mounted yet), nothing is reported removed
+    for entry in entries:
+        if not entry.name.lower().endswith(".pdf") or not entry.is_file():
+            continue
+        stat = entry.stat()
+        signature = (stat.st_size, stat.st_mtime)
+        if known.get(entry.path) == signature:
+            continue
+        if pending.get(entry.path) == signature:
+            ready.append(entry.path)
+            del pending[entry.path]
+        else:
+            pending[entry.path] = signature
+    present = {entry.path for entry in entries}
+    for path in set(pending) - present:
+        del pending[path]   # deleted before it settled
+    return ready, [path for path in list(known) if path not in present]
+
+
+def watch(directory, known, stop, interval=None, batch_size=None):
+    """
+    Generator of (paths, removed) batches, polled every `interval` seconds until `stop` is set: at most
+    `batch_size` new or changed pdfs, and the known pdfs deleted since the last scan (see scan).
+    The caller updates `known`.
+    """
+    interval = config.INGEST_POLL_SECONDS if interval is None else interval
+    batch_size = batch_size or config.INGEST_BATCH_SIZE
+    pending = {}
+    while not stop.is_set():
+        paths, removed = scan(directory, known, pending)
+        if removed and not paths:
+            yield [], removed
+        for i in range(0, len(paths), batch_size):
+            yield paths[i:i + batch_size], removed if i == 0 else []
+        if not pending:
+            stop.wait(interval)
+        else:
+            stop.wait(min(interval, 0.5))   # files settling, look again soon
+
+
+def load_batches(batches, failed):
+    """(paths, loaded paths, documents) per batch, one document per readable pdf; unreadable files are added to `failed`."""
+    for paths in batches:
+        docs, loaded = [], []
+        for path in paths:
+            try:
+                docs.append(load_single_pdf(path))
+                loaded.append(path)
+            except Exception as error:
+                failed[path] = str(error)
+                metrics.incr("ingest_failed_files")
+        yield paths, loaded, docs
+
+
+class IngestionWorker:
+    """
+    Keeps the engine indexes current with a watched resumes folder.
+    A watcher thread polls the folder and puts batches of new pdfs on a bounded queue; the worker thread
+    pulls them through a generator pipeline (load -> extract -> embed and index, MatchingEngine.ingest).
+    When extraction falls behind the queue fills up and the watcher blocks instead of reading ahead, so
+    at most `queue_size` batches are in flight whatever the number of files dropped in.
+    With delete_processed the ingested pdfs are removed (an inbox or upload folder), otherwise they are
+    remembered by size and mtime and only ingested again when they change. Candidates are keyed on
+    their source path: a changed pdf replaces the candidates extracted from its previous version and a
+    deleted pdf retires them from every index (not in inbox mode, where a file name is no identity).
+    """
+
+    def __init__(self, engine, directory, interval=None, batch_size=None, queue_size=None, delete_processed=None,
+                 on_ingested=None):
+        self.engine = engine
+        self.directory = directory
+        self.interval = interval
+        self.batch_size = batch_size
+        self.delete_processed = bool(config.INGEST_DELETE_PROCESSED if delete_processed is None else delete_processed)
+        self.on_ingested = on_ingested
+        self.batches = queue.Queue(maxsize=queue_size or config.INGEST_QUEUE_SIZE)
+        self.stop_event = threading.Event()
+        self.known = {}      # path -> (size, mtime) of the files ingested so far
+        self.failed = {}     # path -> error of the files that could not be read
+        self.ingested = 0
+        self.in_flight = 0   # files taken by the watcher and not processed yet
+        self.lock = threading.Lock()
+        self.threads = []
+
+    def start(self):
+        os.makedirs(self.directory, exist_ok=True)
+        self.threads = [
+            threading.Thread(target=self._watch, name="ingestion-watcher", daemon=True),
+            threading.Thread(target=self._work, name="ingestion-worker", daemon=True),
+        ]
+        for thread in self.threads:
+            thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        self.stop_event.set()
+        for thread in self.threads:
+            thread.join(timeout)
+
+    def _watch(self):
+        for paths, removed in watch(self.directory, self.known, self.stop_event, self.interval, self.batch_size):
+            # mark the batch as taken so the next scans skip it, put blocks while the queue is full
+            with self.lock:
+                for path in paths:
+                    self.known[path] = self._signature(path)
+                for path in removed:
+                    self.known.pop(path, None)
+                self.in_flight += len(paths)
+            if self.delete_processed:
+                removed = []   # inbox: files disappear once ingested, their candidates stay
+            if not paths and not removed:
+                continue
+            while not self.stop_event.is_set():
+                try:
+                    self.batches.put((paths, removed), timeout=0.5)
+                    break
+                except queue.Full:
+                    metrics.incr("ingest_backpressure_waits")
+
+    def _queued(self):
+        # removals are applied in queue order, before the files queued after them are ingested
+        while not self.stop_event.is_set():
+            try:
+                paths, removed = self.batches.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            if removed:
+                self._retire(removed)
+            if paths:
+                metrics.incr("ingest_batches")
+                yield paths
+
+    def _retire(self, paths):
+        try:
+            self.engine.remove(self._candidate_ids(paths))
+        except Exception as error:
+            for path in paths:
+                self.failed[path] = str(error)
+            metrics.incr("ingest_failed_batches")
+            return
+        for path in paths:
+            self.failed.pop(path, None)
+        metrics.incr("ingest_removed_files", len(paths))
+
+    def _candidate_ids(self, paths):
+        return {vector_id for path in paths for vector_id in self.engine.candidate_store.by_source(path)}
+
+    def _work(self):
+        for paths, loaded, docs in load_batches(self._queued(), self.failed):
+            try:
+                self._ingest(loaded, docs)
+            finally:
+                with self.lock:
+                    self.in_flight -= len(paths)
+
+    def _ingest(self, paths, docs):
+        try:
+            candidates = self.engine.ingest(docs) if docs else []
+        except Exception as error:
+            for path in paths:
+                self.failed[path] = str(error)
+                self.known.pop(path, None)   # picked up again on a later scan
+            metrics.incr("ingest_failed_batches")
+            return
+        self.ingested += len(candidates)
+        if not self.delete_processed:
+            # the candidates of the previous version of a changed file
+            stale = self._candidate_ids(paths) - {doc.metadata["vector_id"] for doc in candidates}
+            if stale:
+                self.engine.remove(stale)
+        for path in paths:
+            self.failed.pop(path, None)
+        if self.delete_processed:
+            for path in paths:
+                with contextlib.suppress(FileNotFoundError):
+                    os.remove(path)
+                self.known.pop(path, None)
+        if self.on_ingested:
+            self.on_ingested(paths, candidates)
+
+    @staticmethod
+    def _signature(path):
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return stat.st_size, stat.st_mtime
+
+    def wait_idle(self, timeout=None, settle=None):
+        """Block until every pdf in the folder is ingested (or failed), for scripts and tests."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        settle = settle if settle is not None else 2 * (config.INGEST_POLL_SECONDS if self.interval is None else self.interval)
+        idle_since = None
+        while deadline is None or time.monotonic() < deadline:
+            busy = self.in_flight or any(
+                path not in self.known and path not in self.failed
+                for path in (entry.path for entry in os.scandir(self.directory) if entry.name.lower().endswith(".pdf"))
+            )
+            if busy:
+                idle_since = None
+            elif idle_since is None:
+                idle_since = time.monotonic()
+            elif time.monotonic() - idle_since >= settle:
+                return True
+            time.sleep(0.05)
+        return False
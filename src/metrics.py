@@ -0,0 +1,106 @@
+# lightweight in-process metrics: wall time per pipeline stage, counters (llm calls, tokens, retries, cache hits)
+# exported as json or prometheus text
+
+import json
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+
+class Metrics:
+    """
+    Thread-safe registry of stage timers and counters for the lifetime of the process.
+    A stage records its call count, total and max wall time; calls running in parallel threads
+    are all counted, so a stage total can exceed the wall time of the run.
+    """
+
+    def __init__(self, prefix="candidate_matching"):
+        self.prefix = prefix
+        self.lock = threading.Lock()
+        self.stages = {}
+        self.counters = {}
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def timed(self, name):
+        # decorator version of stage()
+        def decorator(fn):
+            @wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.stage(name):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def observe(self, name, seconds):
+        with self.lock:
+            stage = self.stages.setdefault(name, {"count": 0, "seconds": 0.0, "max_seconds": 0.0})
+            stage["count"] += 1
+            stage["seconds"] += seconds
+            stage["max_seconds"] = max(stage["max_seconds"], seconds)
+
+    def incr(self, name, value=1):
+        if not value:
+            return
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                "stages": {name: dict(stage) for name, stage in self.stages.items()},
+                "counters": dict(self.counters),
+            }
+
+    def reset(self):
+        with self.lock:
+            self.stages.clear()
+            self.counters.clear()
+
+    def to_json(self, indent=2):
+        return json.dumps(self.snapshot(), indent=indent, sort_keys=True)
+
+    def to_prometheus(self):
+        snapshot = self.snapshot()
+        lines = [f"# TYPE {self.prefix}_stage_seconds summary"]
+        for name, stage in sorted(snapshot["stages"].items()):
+            lines.append(f'{self.prefix}_stage_seconds_sum{{stage="{name}"}} {stage["seconds"]:.6f}')
+            lines.append(f'{self.prefix}_stage_seconds_count{{stage="{name}"}} {stage["count"]}')
+        lines.append(f"# TYPE {self.prefix}_stage_max_seconds gauge")
+        for name, stage in sorted(snapshot["stages"].items()):
+            lines.append(f'{self.prefix}_stage_max_seconds{{stage="{name}"}} {stage["max_seconds"]:.6f}')
+        for name, value in sorted(snapshot["counters"].items()):
+            lines.append(f"# TYPE {self.prefix}_{name}_total counter")
+            lines.append(f"{self.prefix}_{name}_total {value}")
+        return "\n".join(lines) + "\n"
+
+
+class UsageCallback(BaseCallbackHandler):
+    """Langchain callback counting llm calls, errors and token usage (from the response usage metadata)."""
+
+    def __init__(self, metrics):
+        self.metrics = metrics
+
+    def on_llm_end(self, response, **kwargs):
+        self.metrics.incr("llm_calls")
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+                self.metrics.incr("llm_input_tokens", usage.get("input_tokens", 0))
+                self.metrics.incr("llm_output_tokens", usage.get("output_tokens", 0))
+
+    def on_llm_error(self, error, **kwargs):
+        self.metrics.incr("llm_errors")
+
+
+# process wide registry used by the pipeline
+metrics = Metrics()
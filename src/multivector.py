@@ -0,0 +1,235 @@
+# multi-vector (field aware) candidate embeddings: one vector per resume field, scored per field against the job
+
+import os
+import threading
+
+import numpy as np
+
+from src import config
+from src.metrics import metrics
+
+
+# candidate fields with their own vector, and the job field each one is compared with
+FIELDS = ("skills", "experience", "projects", "summary")
+
+
+def field_weights():
+    return {
+        "skills": config.MULTIVECTOR_SKILLS_WEIGHT,
+        "experience": config.MULTIVECTOR_EXPERIENCE_WEIGHT,
+        "projects": config.MULTIVECTOR_PROJECTS_WEIGHT,
+        "summary": config.MULTIVECTOR_SUMMARY_WEIGHT,
+    }
+
+
+def _join(values):
+    if isinstance(values, (list, tuple)):
+        return ", ".join(str(v) for v in values if v)
+    return "" if values in (None, "not available") else str(values)
+
+
+def resume_fields(resume_json):
+    """{field: text} of the extracted resume json. Unlike resume_to_text, projects keep their descriptions."""
+    projects = resume_json.get("projects") or []
+    if not isinstance(projects, list):
+        projects = []
+    return {
+        "skills": _join(resume_json.get("skills")),
+        "experience": f"{_join(resume_json.get('role'))}. {resume_json.get('experience_years')} years of experience."
+        if resume_json.get("role") not in (None, "not available") else "",
+        "projects": "\n".join(
+            f"{p.get('title', '')}: {p.get('description', '')}".strip(": ") if isinstance(p, dict) else str(p)
+            for p in projects
+        ),
+        "summary": " ".join(filter(None, [_join(resume_json.get("summary")), _join(resume_json.get("education"))])),
+    }
+
+
+def job_fields(job_doc):
+    """{field: text} of a job document, the text each candidate field is compared with."""
+    metadata = job_doc.metadata
+    classification = metadata.get("skill_classification") or {}
+    skills = [s for bucket in ("must_have", "important", "nice_to_have") for s in classification.get(bucket) or []
+              if str(s).lower() != "none"] or metadata.get("skills") or []
+    description = metadata.get("description") or job_doc.page_content
+    role = metadata.get("role")
+    return {
+        "skills": _join(list(dict.fromkeys(skills))) or job_doc.page_content,
+        "experience": f"{role}. {metadata.get('experience_required')} years of experience." if role
+        else job_doc.page_content,
+        "projects": description,
+        "summary": description,
+    }
+
+
+def quantize(vectors, dim=None):
+    """
+    Compact storage of (n, dim) vectors: cut to the first `dim` components (the gemini embeddings are
+    matryoshka trained, so a prefix is itself an embedding) and renormalised, then int8 with one scale
+    per vector. Zero vectors (missing fields) stay zero with a zero scale.
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if dim and vectors.shape[1] > dim:
+        vectors = vectors[:, :dim]
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    vectors = vectors / np.where(norms == 0, 1.0, norms)
+    scales = np.abs(vectors).max(axis=1) / 127
+    data = np.round(vectors / np.where(scales == 0, 1.0, scales)[:, None]).astype(np.int8)
+    return data, scales.astype(np.float32)
+
+
+class FieldIndex:
+    """
+    Per candidate, one int8 vector per field of FIELDS ((candidates, fields, dim) array plus
+    (candidates, fields) scales), kept in memory and saved as one .npz file.
+    A query embeds the job fields once and scores any set of candidates with a few matrix products:
+    "weighted" sums the field-to-field similarities with the field weights (over the fields the
+    candidate has), "max" takes for each job field the best matching candidate field (max-sim) and
+    averages them with the same weights.
+    Updates build new arrays and publish them in one assignment of the (rows, ids, vectors, scales)
+    snapshot, so searches running meanwhile see either the old or the new index, never a mix.
+    """
+
+    def __init__(self, dim=None):
+        self.dim = config.FIELD_EMBEDDING_DIM if dim is None else dim
+        # vector id -> row, row -> vector id, (n, fields, dim) int8, (n, fields) float32 (0: no such field)
+        self._state = ({}, [], None, None)
+        self.lock = threading.Lock()   # writers only
+
+    rows = property(lambda self: self._state[0])
+    ids = property(lambda self: self._state[1])
+    vectors = property(lambda self: self._state[2])
+    scales = property(lambda self: self._state[3])
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __contains__(self, vector_id):
+        return vector_id in self.rows
+
+    def sync(self, candidates, resume_jsons, embeddings):
+        """Field vectors of the candidates not indexed yet (`resume_jsons`: {vector id: resume json}), see add."""
+        ids = {doc.metadata["vector_id"] for doc in candidates}
+        return self.add({vector_id: resume_json for vector_id, resume_json in resume_jsons.items() if vector_id in ids},
+                        embeddings)
+
+    @metrics.timed("field_index_sync")
+    def add(self, resume_jsons, embeddings):
+        """
+        Embed the fields of the candidates of `resume_jsons` ({vector id: resume json}) not indexed yet,
+        in one batched embed_documents call for all of their fields. Returns the number added.
+        """
+        new = [vector_id for vector_id in resume_jsons if vector_id not in self.rows]
+        if not new:
+            return 0
+        texts = [resume_fields(resume_jsons[vector_id])[field] for vector_id in new for field in FIELDS]
+        present = [i for i, text in enumerate(texts) if text.strip()]
+        embedded = embeddings.embed_documents([texts[i] for i in present]) if present else []
+        size = len(embedded[0]) if embedded else (self.vectors.shape[2] if self.vectors is not None else 1)
+        vectors = np.zeros((len(texts), size), dtype=np.float32)
+        if present:
+            vectors[present] = np.asarray(embedded, dtype=np.float32)
+        data, scales = quantize(vectors, self.dim)
+        added = self._append(new, data.reshape(len(new), len(FIELDS), -1), scales.reshape(len(new), len(FIELDS)))
+        metrics.incr("field_vectors_added", len(present))
+        return added
+
+    def _append(self, ids, vectors, scales):
+        with self.lock:
+            rows, old_ids, old_vectors, old_scales = self._state
+            keep = [i for i, vector_id in enumerate(ids) if vector_id not in rows]   # added by a concurrent add
+            if not keep:
+                return 0
+            vectors, scales = vectors[keep], scales[keep]
+            if old_vectors is not None and old_vectors.shape[2] != vectors.shape[2]:
+                raise ValueError(f"field vectors of size {vectors.shape[2]} do not match the index ({old_vectors.shape[2]})")
+            new_ids = old_ids + [ids[i] for i in keep]
+            self._state = (
+                {vector_id: row for row, vector_id in enumerate(new_ids)}, new_ids,
+                vectors if old_vectors is None else np.concatenate([old_vectors, vectors]),
+                scales if old_scales is None else np.concatenate([old_scales, scales]),
+            )
+            return len(keep)
+
+    def remove(self, vector_ids):
+        with self.lock:
+            rows, ids, vectors, scales = self._state
+            drop = {rows[i] for i in vector_ids if i in rows}
+            if not drop:
+                return
+            keep = np.array([row for row in range(len(ids)) if row not in drop], dtype=np.int64)
+            new_ids = [ids[row] for row in keep]
+            self._state = ({vector_id: row for row, vector_id in enumerate(new_ids)}, new_ids,
+                           vectors[keep], scales[keep])
+
+    def query_vectors(self, job_doc, embeddings):
+        # the job fields embedded as queries (identical texts are embedded once), cut and normalised like the index
+        texts = job_fields(job_doc)
+        unique = list(dict.fromkeys(texts[field] for field in FIELDS))
+        vectors = dict(zip(unique, (embeddings.embed_query(text) for text in unique)))
+        query = np.asarray([vectors[texts[field]] for field in FIELDS], dtype=np.float32)
+        if self.dim and query.shape[1] > self.dim:
+            query = query[:, :self.dim]
+        return query / np.maximum(np.linalg.norm(query, axis=1, keepdims=True), 1e-12)
+
+    @metrics.timed("field_score")
+    def score(self, query, vector_ids, mode=None, weights=None, chunk_size=4096):
+        """
+        Multi-vector score of every candidate of `vector_ids` (-inf when not indexed) for the job field
+        vectors `query` ((fields, dim), see query_vectors). Scored in chunks of `chunk_size` candidates,
+        so only one chunk is ever dequantized.
+        """
+        mode = mode or config.MULTIVECTOR_MODE
+        weights = weights or field_weights()
+        w = np.array([weights[field] for field in FIELDS], dtype=np.float32)
+        rows, _, vectors, all_scales = self._state   # one consistent snapshot for the whole query
+        scores = np.full(len(vector_ids), -np.inf, dtype=np.float32)
+        positions = [(i, rows[v]) for i, v in enumerate(vector_ids) if v in rows]
+        for start in range(0, len(positions), chunk_size):
+            chunk = positions[start:start + chunk_size]
+            chunk_rows = np.array([row for _, row in chunk], dtype=np.int64)
+            scales = all_scales[chunk_rows]                                              # (c, f)
+            # (c, candidate field, job field) cosine similarities
+            sims = np.einsum("cfd,qd->cfq", vectors[chunk_rows].astype(np.float32), query) * scales[:, :, None]
+            present = scales > 0
+            if mode == "max":
+                best = np.where(present[:, :, None], sims, -np.inf).max(axis=1)        # (c, job field)
+                best = np.where(np.isfinite(best), best, 0.0)
+                chunk_scores = best @ w / w.sum()
+            else:
+                same_field = np.einsum("cff->cf", sims)                                # field to field
+                field_w = present * w
+                chunk_scores = (same_field * field_w).sum(axis=1) / np.maximum(field_w.sum(axis=1), 1e-12)
+            scores[[i for i, _ in chunk]] = chunk_scores
+        return scores
+
+    def search(self, query, vector_ids, k, mode=None):
+        """Top k (vector id, score) among `vector_ids`, best first, like a dense search."""
+        vector_ids = list(vector_ids)
+        scores = self.score(query, vector_ids, mode)
+        top = [i for i in np.argsort(-scores, kind="stable")[:k] if np.isfinite(scores[i])]
+        return [(vector_ids[i], float(scores[i])) for i in top]
+
+    def save(self, path):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self.lock:
+            _, ids, vectors, scales = self._state
+            with open(path + ".tmp", "wb") as f:
+                np.savez(f, ids=np.array(ids, dtype=str), dim=self.dim,
+                         vectors=vectors if vectors is not None else np.zeros((0, len(FIELDS), 0), np.int8),
+                         scales=scales if scales is not None else np.zeros((0, len(FIELDS)), np.float32))
+            os.replace(path + ".tmp", path)
+
+    @classmethod
+    def load(cls, path):
+        """The saved index, or None when missing or saved with another FIELD_EMBEDDING_DIM."""
+        if not os.path.isfile(path):
+            return None
+        data = np.load(path)
+        if int(data["dim"]) != config.FIELD_EMBEDDING_DIM:
+            return None
+        index = cls()
+        if len(data["ids"]):
+            index._append(data["ids"].tolist(), data["vectors"], data["scales"])
+        return index
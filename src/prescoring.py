@@ -0,0 +1,147 @@
+# deterministic structured pre-scoring of the candidates, no llm or embedding call involved
+
+from functools import lru_cache
+
+import numpy as np
+
+from src import config
+from src.analyzer import analyze
+from src.fusion import as_number
+from src.metrics import metrics
+
+
+# skill buckets of the job post (skill_classification) and their weight in the skill overlap
+SKILL_BUCKETS = ("must_have", "important", "nice_to_have")
+
+
+def bucket_weights():
+    return {
+        "must_have": config.PRESCORE_MUST_HAVE_WEIGHT,
+        "important": config.PRESCORE_IMPORTANT_WEIGHT,
+        "nice_to_have": config.PRESCORE_NICE_TO_HAVE_WEIGHT,
+    }
+
+
+@lru_cache(maxsize=65536)
+def skill_key(skill):
+    # one key per spelling of a skill: "Machine Learning", "ML" and "machine-learning" all become "machine_learning"
+    return " ".join(analyze.tokenize(str(skill)))
+
+
+def job_skill_weights(job_doc):
+    """{skill key: weight} of the job, the highest bucket wins when a skill is listed twice."""
+    classification = job_doc.metadata.get("skill_classification") or {}
+    if not any(classification.get(bucket) for bucket in SKILL_BUCKETS):
+        # no classification (older job documents): every listed skill counts as important
+        classification = {"important": job_doc.metadata.get("skills") or []}
+    weights = {}
+    for bucket, weight in bucket_weights().items():
+        for skill in classification.get(bucket) or []:
+            key = skill_key(skill)
+            if key:
+                weights[key] = max(weights.get(key, 0.0), weight)
+    return weights
+
+
+def certification_tokens(doc):
+    # from the metadata (candidate store documents), else read back from the "Certifications:" line
+    # of the candidate text, tagged by the analyzer
+    if "certifications" in doc.metadata:
+        return {token for cert in doc.metadata["certifications"] or [] for token in analyze.tokenize(str(cert))}
+    return {token[5:] for token in analyze(doc.page_content) if token.startswith("cert:")}
+
+
+class CandidateFeatures:
+    """
+    The structured fields of a candidate pool packed into flat numpy arrays, built once per pool:
+    every (candidate, skill) pair is one entry of `skill_rows` / `skill_ids` over a shared skill
+    vocabulary, the same for the certification tokens, and the experience is one float array.
+    Scoring a job is then a few gathers and bincounts, whatever the size of the pool.
+    """
+
+    def __init__(self, candidates, id_key="vector_id"):
+        self.ids = [doc.metadata[id_key] for doc in candidates]
+        self.experience = np.array([as_number(doc.metadata.get("experience")) for doc in candidates], dtype=np.float32)
+        self.skill_vocabulary, self.skill_rows, self.skill_ids = self._pack(
+            candidates, lambda doc: {skill_key(skill) for skill in doc.metadata.get("skills") or []} - {""}
+        )
+        self.cert_vocabulary, self.cert_rows, self.cert_ids = self._pack(candidates, certification_tokens)
+
+    def __len__(self):
+        return len(self.ids)
+
+    @staticmethod
+    def _pack(candidates, keys_of):
+        vocabulary, rows, ids = {}, [], []
+        for row, doc in enumerate(candidates):
+            for key in keys_of(doc):
+                rows.append(row)
+                ids.append(vocabulary.setdefault(key, len(vocabulary)))
+        return vocabulary, np.array(rows, dtype=np.int32), np.array(ids, dtype=np.int32)
+
+    def _overlap(self, weights, vocabulary, rows, ids):
+        # per candidate: sum of the weights of the job keys it has
+        vector = np.zeros(len(vocabulary), dtype=np.float32)
+        for key, weight in weights.items():
+            if key in vocabulary:
+                vector[vocabulary[key]] = weight
+        return np.bincount(rows, weights=vector[ids], minlength=len(self)).astype(np.float32)
+
+    def score(self, job_doc):
+        """
+        Pre-score of every candidate for the job, in [0, 1]: weighted mix of the skill overlap
+        (must have / important / nice to have weights), the experience fit and the certifications
+        that mention the job skills. Returns (score, components) arrays in candidate order.
+        """
+        weights = job_skill_weights(job_doc)
+        total = sum(weights.values())
+        skills = self._overlap(weights, self.skill_vocabulary, self.skill_rows, self.skill_ids) / total if total \
+            else np.ones(len(self), dtype=np.float32)
+
+        # certifications are matched token by token, a skill's weight is spread over its tokens
+        token_weights = {}
+        for key, weight in weights.items():
+            tokens = key.split()
+            for token in tokens:
+                token_weights[token] = max(token_weights.get(token, 0.0), weight / len(tokens))
+        token_total = sum(token_weights.values())
+        certifications = np.minimum(1.0, self._overlap(token_weights, self.cert_vocabulary, self.cert_rows,
+                                                       self.cert_ids) / token_total) if token_total \
+            else np.zeros(len(self), dtype=np.float32)
+
+        required = as_number(job_doc.metadata.get("experience_required"))
+        experience = np.minimum(1.0, self.experience / required) if required > 0 else np.ones(len(self), dtype=np.float32)
+
+        score = (config.PRESCORE_SKILL_WEIGHT * skills + config.PRESCORE_EXPERIENCE_WEIGHT * experience
+                 + config.PRESCORE_CERTIFICATION_WEIGHT * certifications)
+        score /= config.PRESCORE_SKILL_WEIGHT + config.PRESCORE_EXPERIENCE_WEIGHT + config.PRESCORE_CERTIFICATION_WEIGHT
+        return score, {"skills": skills, "experience": experience, "certifications": certifications}
+
+    @metrics.timed("prescore")
+    def score_matrix(self, job_docs):
+        """(jobs x candidates) pre-scores, one row per job document."""
+        return np.vstack([self.score(job_doc)[0] for job_doc in job_docs]) if job_docs \
+            else np.zeros((0, len(self)), dtype=np.float32)
+
+    @metrics.timed("prescore")
+    def shortlist(self, job_doc, keep, allowed_ids=None):
+        """
+        Ids of the `keep` best pre-scored candidates among `allowed_ids` (all when None), with {id: score}.
+        keep <= 0 keeps every allowed candidate, only scored.
+        """
+        score, _ = self.score(job_doc)
+        columns = np.arange(len(self)) if allowed_ids is None \
+            else np.array([i for i, doc_id in enumerate(self.ids) if doc_id in allowed_ids], dtype=np.int64)
+        if 0 < keep < len(columns):
+            columns = columns[np.argpartition(-score[columns], keep - 1)[:keep]]
+        scores = {self.ids[i]: float(score[i]) for i in columns}
+        return set(scores), scores
+
+
+def top_k_mask(scores, keep):
+    """Boolean matrix of the `keep` best entries of every row (everything when keep <= 0)."""
+    if keep <= 0 or keep >= scores.shape[1]:
+        return np.ones(scores.shape, dtype=bool)
+    mask = np.zeros(scores.shape, dtype=bool)
+    np.put_along_axis(mask, np.argpartition(-scores, keep - 1, axis=1)[:, :keep], True, axis=1)
+    return mask
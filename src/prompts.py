@@ -1,5 +1,7 @@
 from langchain_core.prompts import PromptTemplate
 from langchain_core.output_parsers import JsonOutputParser
+from pydantic import BaseModel, Field
+from typing import List
 
 parser = JsonOutputParser()
 
@@ -72,6 +74,24 @@ job_post_prompt = PromptTemplate(
 
     # If multiple job roles are mentioned, return an array of job posting objects.
 
+# structured output of the candidate ranking, one evaluation per candidate
+
+class CandidateEvaluation(BaseModel):
+    id: str = Field(description="the Candidate ID exactly as given")
+    name: str = Field(description="the candidate name")
+    score: float = Field(description="overall fit score from 0 to 100")
+    confidence: str = Field(description="confidence level in the score: high, medium or low")
+    strengths: List[str] = Field(description="short strengths of the candidate for this job")
+    gaps: List[str] = Field(description="short skill gaps of the candidate for this job")
+    explanation: str = Field(description="why the candidate fits or does not fit, and why it is ranked here")
+
+
+class CandidateRanking(BaseModel):
+    candidates: List[CandidateEvaluation] = Field(description="candidates ranked from strongest to weakest match")
+
+
+ranking_parser = JsonOutputParser(pydantic_object=CandidateRanking)
+
 candidate_matching_prompt = PromptTemplate(
     template="""
     Evaluate and score the candidates through a structured, multi-dimensional framework 
@@ -97,9 +117,44 @@ candidate_matching_prompt = PromptTemplate(
     Job Description:
     {job_description}
 
-    Candidates:
+    Candidates (each one starts with its Candidate ID):
     {candidate_context}
+
+    ### REQUIRED JSON FORMAT:
+    {format_instructions}
+
+    ### RETURN ONLY VALID JSON, NO PREAMBLE:
     """,
-    input_variables=['job_description','candidate_context']
+    input_variables=['job_description','candidate_context'],
+    partial_variables={"format_instructions": ranking_parser.get_format_instructions()},
+)
 
-)
\ No newline at end of file
+
+candidate_scoring_prompt = PromptTemplate(
+    template="""
+    Score each of the candidates below against the job description.
+
+    Use the following criteria:
+    - Skill alignment
+    - Experience relevance
+    - Educational fit
+    - Role compatibility
+    - Overall suitability
+
+    Job Description:
+    {job_description}
+
+    Candidates (each one starts with its Candidate ID):
+    {candidate_context}
+
+    ### INSTRUCTION:
+    Return one entry per candidate, ranked from strongest to weakest match.
+
+    ### REQUIRED JSON FORMAT:
+    {format_instructions}
+
+    ### RETURN ONLY VALID JSON, NO PREAMBLE:
+    """,
+    input_variables=['job_description','candidate_context'],
+    partial_variables={"format_instructions": ranking_parser.get_format_instructions()},
+)
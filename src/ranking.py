@@ -0,0 +1,118 @@
+# llm ranking of the retrieved candidates, map-reduce style for large pools
+
+from src import config
+from src.concurrency import TokenBucket, call_with_retry, bounded_map
+from src.fusion import as_number
+
+
+def candidate_context(candidates, id_key="vector_id"):
+    # candidate texts prefixed by their id, so the llm can refer back to them
+    return "\n\n".join(f"Candidate ID: {doc.metadata[id_key]}\n{doc.page_content.strip()}" for doc in candidates)
+
+
+def parse_scores(response, candidates, id_key="vector_id"):
+    """
+    Turn the llm json ({"candidates": [...]}, see prompts.CandidateRanking) into one record per candidate:
+    {"id", "name", "score", "confidence", "strengths", "gaps", "explanation"}, best score first.
+    Entries with an unknown id are matched on name, candidates the llm skipped get a score of 0.
+    """
+    entries = response.get("candidates", []) if isinstance(response, dict) else response or []
+    by_id = {doc.metadata[id_key]: doc for doc in candidates}
+    by_name = {str(doc.metadata.get("name", "")).lower(): doc.metadata[id_key] for doc in candidates}
+
+    records = {}
+    for entry in entries:
+        if not isinstance(entry, dict):
+            continue
+        candidate_id = str(entry.get("id", ""))
+        if candidate_id not in by_id:
+            candidate_id = by_name.get(str(entry.get("name", "")).lower())
+        if candidate_id is None or candidate_id in records:
+            continue
+        records[candidate_id] = {
+            "id": candidate_id,
+            "name": by_id[candidate_id].metadata.get("name", entry.get("name")),
+            "score": as_number(entry.get("score")),
+            "confidence": str(entry.get("confidence") or "not available"),
+            "strengths": list(entry.get("strengths") or []),
+            "gaps": list(entry.get("gaps") or []),
+            "explanation": str(entry.get("explanation") or ""),
+        }
+    for candidate_id, doc in by_id.items():
+        records.setdefault(candidate_id, {"id": candidate_id, "name": doc.metadata.get("name"), "score": 0.0,
+                                          "confidence": "not available", "strengths": [], "gaps": [],
+                                          "explanation": "not evaluated by the model"})
+    return sorted(records.values(), key=lambda r: r["score"], reverse=True)
+
+
+# plain text card of a scored candidate, used for the reports
+def record_to_text(record):
+    return "\n".join([
+        f"{record['name']}",
+        f"Score: {record['score']:.0f}",
+        f"Confidence: {record.get('confidence', 'not available')}",
+        f"Strengths: {', '.join(record['strengths']) or 'not available'}",
+        f"Gaps: {', '.join(record['gaps']) or 'not available'}",
+        f"Explanation: {record.get('explanation') or 'not available'}",
+    ])
+
+
+def rank_candidates(candidates, job_description, llm_model, prompt_template, parser, max_retries=None):
+    """Rank all the candidates in one llm call, returns the parsed records best first."""
+    chain = prompt_template | llm_model | parser
+    response = call_with_retry(
+        chain.invoke, {"job_description": job_description, "candidate_context": candidate_context(candidates)},
+        max_retries=config.LLM_MAX_RETRIES if max_retries is None else max_retries,
+        base_delay=config.LLM_RETRY_BASE_DELAY
+    )
+    return parse_scores(response, candidates)
+
+
+def stream_rank_candidates(candidates, job_description, llm_model, prompt_template, parser):
+    """
+    Same single call as rank_candidates, but streamed: yields the partially parsed json
+    ({"candidates": [...]}) after every chunk of the llm response, so the caller can render the
+    evaluations while they are written. Pass the last yielded value to parse_scores for the records.
+    Not retried, a stream cannot be replayed once its first chunks have been shown.
+    """
+    chain = prompt_template | llm_model | parser
+    yield from chain.stream({"job_description": job_description, "candidate_context": candidate_context(candidates)})
+
+
+def rank_candidates_map_reduce(candidates, job_description, llm_model, prompt_template, parser,
+                               batch_size=None, keep_per_batch=None, top_k=None,
+                               max_workers=None, requests_per_minute=None, max_retries=None):
+    """
+    Tournament ranking: candidates are scored by the llm in fixed-size batches running in parallel (map),
+    the best `keep_per_batch` of each batch move on and are re-scored together (reduce), until the
+    survivors fit in one batch. Every llm call sees at most `batch_size` resumes, so the prompt size
+    stays fixed and latency only grows with the number of rounds (log of the pool size).
+    Returns the top_k records (see parse_scores) from the final round, best first.
+    """
+    batch_size = max(2, batch_size or config.RANKING_BATCH_SIZE)
+    keep_per_batch = keep_per_batch or config.RANKING_KEEP_PER_BATCH
+    max_workers = max_workers or config.EXTRACTION_MAX_WORKERS
+    requests_per_minute = config.LLM_REQUESTS_PER_MINUTE if requests_per_minute is None else requests_per_minute
+    max_retries = config.LLM_MAX_RETRIES if max_retries is None else max_retries
+    keep_per_batch = max(1, min(keep_per_batch, batch_size - 1))  # every round has to shrink the pool
+
+    chain = prompt_template | llm_model | parser
+    rate_limiter = TokenBucket.per_minute(requests_per_minute) if requests_per_minute else None
+
+    def score_batch(batch):
+        response = call_with_retry(
+            chain.invoke, {"job_description": job_description, "candidate_context": candidate_context(batch)},
+            max_retries=max_retries, base_delay=config.LLM_RETRY_BASE_DELAY, rate_limiter=rate_limiter
+        )
+        return parse_scores(response, batch)
+
+    pool = list(candidates)
+    by_id = {doc.metadata["vector_id"]: doc for doc in pool}
+    while True:
+        batches = [pool[i:i + batch_size] for i in range(0, len(pool), batch_size)]
+        results = bounded_map(score_batch, batches, max_workers=max_workers)
+        if len(batches) <= 1:
+            final = results[0] if results else []
+            return final[:top_k] if top_k else final
+        # reduce: the best of every batch go to the next round
+        pool = [by_id[record["id"]] for batch_records in results for record in batch_records[:keep_per_batch]]
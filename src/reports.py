@@ -0,0 +1,139 @@
+# per candidate pdf reports of a ranking, built in the background, cached and bundled as one zip
+
+import io
+import json
+import re
+import threading
+import time
+import zipfile
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from xml.sax.saxutils import escape
+
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.platypus import SimpleDocTemplate, Paragraph
+
+from src import config
+from src.cache import text_hash
+from src.metrics import metrics
+from src.ranking import record_to_text
+
+
+def report_pdf(record):
+    """PDF bytes of one candidate evaluation (the record_to_text lines)."""
+    buffer = io.BytesIO()
+    styles = getSampleStyleSheet()
+    story = [Paragraph(escape(record_to_text(record)).replace("\n", "<br/>"), styles["Normal"])]
+    SimpleDocTemplate(buffer).build(story)
+    return buffer.getvalue()
+
+
+def timed_report_pdf(record):
+    # runs on a worker process: the build time goes back with the pdf and is recorded by the parent's metrics
+    start = time.perf_counter()
+    pdf = report_pdf(record)
+    return pdf, time.perf_counter() - start
+
+
+def ranking_version(records):
+    # hash of the ranked records, a new ranking (or a re-ranked candidate) gets new reports
+    return text_hash(json.dumps(records, sort_keys=True, default=str))[:16]
+
+
+def report_file_name(record):
+    name = re.sub(r"[^\w\-]+", "_", str(record.get("name") or "candidate")).strip("_") or "candidate"
+    return f"{name}_{str(record['id'])[:8]}_report.pdf"
+
+
+class ReportBuilder:
+    """
+    Builds the reports of a ranking on a pool of `max_workers` processes (reportlab layout is pure
+    python and holds the GIL, so threads would stall the app's own rendering) and keeps the last
+    `max_entries` of them (LRU, the current ranking's are never evicted) keyed by candidate id and
+    ranking version, so reruns and repeated downloads never build a report twice. Nothing here waits:
+    submit() schedules the whole shortlist, result() and zip() return None until the reports they
+    need are built.
+    """
+
+    def __init__(self, max_workers=None, max_entries=None):
+        self.executor = ProcessPoolExecutor(max_workers=max_workers or config.REPORT_WORKERS)
+        self.max_entries = max_entries or config.REPORT_CACHE_SIZE
+        self.reports = OrderedDict()   # (candidate id, ranking version) -> future of the pdf bytes
+        self.zips = OrderedDict()      # ranking version -> zip bytes of its reports
+        self.lock = threading.Lock()
+
+    def _future(self, record, version, count_hit=False):
+        key = (record["id"], version)
+        with self.lock:
+            future = self.reports.get(key)
+            if future is not None:
+                self.reports.move_to_end(key)
+                if count_hit:
+                    metrics.incr("report_cache_hits")
+                return future
+            future = self.executor.submit(timed_report_pdf, record)
+            future.add_done_callback(self._built)
+            self.reports[key] = future
+            # the oldest reports of other rankings go first, the ranking being built is never evicted
+            # (a shortlist longer than max_entries would otherwise keep rebuilding its own reports)
+            excess = len(self.reports) - self.max_entries
+            if excess > 0:
+                for old in [k for k in self.reports if k[1] != version][:excess]:
+                    del self.reports[old]
+        return future
+
+    @staticmethod
+    def _built(future):
+        if not future.cancelled() and future.exception() is None:
+            metrics.observe("report_pdf", future.result()[1])
+
+    def submit(self, records, version):
+        """Start building every report of the ranking not built yet, returns at once."""
+        for record in records:
+            self._future(record, version, count_hit=True)
+
+    def result(self, record, version):
+        """
+        PDF bytes of the candidate's report, None while it is still being built (it is scheduled
+        if it was not). A failed build is dropped, so the next call starts it again, and re-raised.
+        """
+        future = self._future(record, version)
+        if not future.done():
+            return None
+        if future.cancelled() or future.exception() is not None:
+            with self.lock:
+                if self.reports.get((record["id"], version)) is future:
+                    del self.reports[(record["id"], version)]
+            if future.cancelled():
+                return None
+        return future.result()[0]
+
+    def done(self, records, version):
+        """Number of the ranking's reports built so far."""
+        return sum(self.result(record, version) is not None for record in records)
+
+    def zip(self, records, version):
+        """
+        One zip of every report of the ranking, numbered in ranking order, or None until all of
+        them are built. The zip is assembled once per ranking version.
+        """
+        with self.lock:
+            if version in self.zips:
+                return self.zips[version]
+        pdfs = [self.result(record, version) for record in records]
+        if any(pdf is None for pdf in pdfs):
+            return None
+        with metrics.stage("report_zip"):
+            buffer = io.BytesIO()
+            with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+                for rank, (record, pdf) in enumerate(zip(records, pdfs), 1):
+                    archive.writestr(f"{rank:03d}_{report_file_name(record)}", pdf)
+            data = buffer.getvalue()
+        with self.lock:
+            self.zips[version] = data
+            while len(self.zips) > 4:
+                self.zips.popitem(last=False)
+        return data
+
+    def close(self):
+        self.executor.shutdown(cancel_futures=True)
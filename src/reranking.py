@@ -0,0 +1,107 @@
+# cpu re-ranking of the retrieved pool, so only the best few candidates reach the llm ranking
+
+import numpy as np
+
+from src import config
+from src.metrics import metrics
+from src.screening import dense_score_matrix
+
+try:
+    from sentence_transformers import CrossEncoder  # optional, only used with RERANKER=cross-encoder
+except ImportError:
+    CrossEncoder = None
+
+
+def min_max(values):
+    values = np.asarray(values, dtype=np.float64)
+    finite = np.isfinite(values)
+    if not finite.any():
+        return np.zeros(len(values))
+    low, high = values[finite].min(), values[finite].max()
+    normalised = (values - low) / (high - low) if high > low else np.ones(len(values))
+    return np.where(finite, normalised, 0.0)
+
+
+class CosineReranker:
+    """
+    Re-scores the retrieved pool without any model call: cosine similarity of the job and candidate
+    vectors (stored in the local index, or served by the embedding cache), blended with the bm25 score
+    and the structured pre-score. Unlike the rank fusion, the actual score magnitudes are kept.
+    With a field index (MULTIVECTOR_MODE) covering the whole pool, the dense part is the field aware score.
+    """
+
+    name = "cosine"
+
+    def __init__(self, vectorstore, embeddings, weights=None, field_index=None):
+        self.vectorstore = vectorstore
+        self.embeddings = embeddings
+        self.field_index = field_index
+        self.weights = weights or {"dense": config.RERANK_DENSE_WEIGHT, "sparse": config.RERANK_SPARSE_WEIGHT,
+                                   "prescore": config.RERANK_PRESCORE_WEIGHT}
+
+    def dense(self, job_description_doc, candidates):
+        ids = [doc.metadata["vector_id"] for doc in candidates]
+        if self.field_index is not None and all(i in self.field_index for i in ids):
+            return self.field_index.score(self.field_index.query_vectors(job_description_doc, self.embeddings), ids)
+        return dense_score_matrix(self.vectorstore, self.embeddings, [job_description_doc.page_content], candidates)[0]
+
+    def score(self, job_description_doc, candidates):
+        cosine = self.dense(job_description_doc, candidates)
+        retrieval = [doc.metadata.get("retrieval_scores") or {} for doc in candidates]
+        parts = {
+            "dense": min_max(cosine),
+            "sparse": min_max([r.get("sparse") if r.get("sparse") is not None else -np.inf for r in retrieval]),
+            "prescore": np.array([r.get("prescore") or 0.0 for r in retrieval], dtype=np.float64),
+        }
+        total = sum(self.weights.values()) or 1.0
+        return sum(self.weights[name] * parts[name] for name in self.weights) / total
+
+
+class CrossEncoderReranker:
+    """
+    Local cross-encoder (sentence-transformers, cpu) reading each (job, candidate) pair together,
+    scored in batches of `batch_size` pairs. Returns sigmoid probabilities.
+    """
+
+    name = "cross-encoder"
+
+    def __init__(self, model=None, batch_size=None):
+        if CrossEncoder is None:
+            raise ImportError("RERANKER=cross-encoder needs the sentence-transformers package")
+        self.model = CrossEncoder(model or config.RERANK_MODEL, device="cpu")
+        self.batch_size = batch_size or config.RERANK_BATCH_SIZE
+
+    def score(self, job_description_doc, candidates):
+        pairs = [(job_description_doc.page_content, doc.page_content) for doc in candidates]
+        logits = np.asarray(self.model.predict(pairs, batch_size=self.batch_size, show_progress_bar=False),
+                            dtype=np.float64)
+        return 1.0 / (1.0 + np.exp(-logits))
+
+
+def make_reranker(vectorstore, embeddings, kind=None, field_index=None):
+    """The reranker selected by RERANKER (cosine | cross-encoder | none), None when disabled."""
+    kind = kind or config.RERANKER
+    if kind == "none":
+        return None
+    if kind == "cross-encoder":
+        return CrossEncoderReranker()
+    return CosineReranker(vectorstore, embeddings, field_index=field_index)
+
+
+@metrics.timed("rerank")
+def rerank(reranker, job_description_doc, candidates, keep):
+    """
+    The `keep` best candidates by re-rank score, best first, each with its score added to
+    metadata["retrieval_scores"]["rerank"].
+    """
+    if not candidates:
+        return []
+    scores = reranker.score(job_description_doc, candidates)
+    order = np.argsort(-scores, kind="stable")[:keep]
+    metrics.incr("rerank_pairs", len(candidates))
+    kept = []
+    for i in order:
+        doc = candidates[i]
+        doc.metadata["retrieval_scores"] = {**(doc.metadata.get("retrieval_scores") or {}), "rerank": float(scores[i])}
+        kept.append(doc)
+    return kept
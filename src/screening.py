@@ -0,0 +1,112 @@
+# bulk screening: many job descriptions scored against one candidate pool in a single pass
+
+import numpy as np
+from langchain_core.documents import Document
+
+from src import config
+from src.concurrency import bounded_map
+from src.fusion import prefilter_mask, fuse_score_matrices
+from src.metrics import metrics
+from src.prescoring import CandidateFeatures, top_k_mask
+from src.vectorstore import normalize
+
+
+@metrics.timed("dense_score_matrix")
+def dense_score_matrix(vectorstore, embeddings, queries, candidates, id_key="vector_id", texts=None):
+    """
+    Cosine similarities of every query text against every candidate, as one (queries x candidates) matrix.
+    The local store scores its stored vectors directly; other stores (pinecone) fall back to the
+    candidate vectors from the (cached) embeddings, so no per-query search round trip is made.
+    The texts of light candidates (no page_content) are looked up with `texts(ids)` -> {id: text},
+    e.g. CandidateStore.texts.
+    """
+    query_vectors = np.asarray(bounded_map(embeddings.embed_query, queries, max_workers=config.EMBEDDING_MAX_WORKERS),
+                               dtype=np.float32)
+    if hasattr(vectorstore, "score_matrix"):
+        return vectorstore.score_matrix(query_vectors, [c.metadata[id_key] for c in candidates])
+    candidate_texts = [c.page_content for c in candidates]
+    if texts is not None and not all(candidate_texts):
+        stored = texts([c.metadata[id_key] for c in candidates if not c.page_content])
+        candidate_texts = [text or stored.get(c.metadata[id_key], "") for text, c in zip(candidate_texts, candidates)]
+    candidate_vectors = np.asarray(embeddings.embed_documents(candidate_texts), dtype=np.float32)
+    return normalize(query_vectors) @ normalize(candidate_vectors).T
+
+
+def screen(job_docs, candidates, vectorstore, embeddings, sparse_index, top_k=5, id_key="vector_id", texts=None,
+           field_index=None):
+    """
+    Shortlist `candidates` for every job description of `job_docs` at once: experience pre-filter,
+    structured pre-scoring (the best PRESCORE_KEEP of each row go on), dense and bm25 score matrices,
+    rank fusion. Returns one list per job description of the best top_k candidates, best first,
+    carrying their per-source scores in metadata["retrieval_scores"] like the single-query retrieval.
+    `texts` loads the texts of light candidates, see dense_score_matrix. With a `field_index`
+    (MULTIVECTOR_MODE) holding every candidate left after the pre-filters, the dense scores are its
+    field aware scores, as in the single-query retrieval.
+    """
+    # identical resumes share their content id and are screened once, as in the single-query retrieval
+    candidates = list({doc.metadata[id_key]: doc for doc in candidates}.values())
+    if not job_docs or not candidates:
+        return [[] for _ in job_docs]
+    queries = [doc.page_content for doc in job_docs]
+    ids = [c.metadata[id_key] for c in candidates]
+
+    mask = prefilter_mask(candidates, [doc.metadata["experience_required"] for doc in job_docs])
+    prescores = CandidateFeatures(candidates, id_key).score_matrix(job_docs)
+    if config.PRESCORE_KEEP > 0:
+        mask &= top_k_mask(np.where(mask, prescores, -np.inf),
+                           max(config.PRESCORE_KEEP, top_k * config.RETRIEVAL_FETCH_MULTIPLIER))
+    scores = {
+        "dense": field_score_matrix(field_index, embeddings, job_docs, ids, mask) if covers(field_index, ids, mask)
+        else dense_score_matrix(vectorstore, embeddings, queries, candidates, id_key, texts),
+        "sparse": sparse_index.score_matrix(queries, ids),
+    }
+    with metrics.stage("fusion"):
+        fused = fuse_score_matrices(scores, mask, method=config.FUSION_METHOD, rrf_k=config.RRF_K,
+                                    fetch_k=top_k * config.RETRIEVAL_FETCH_MULTIPLIER)
+
+    # best top_k of every row: argpartition, then only those few are sorted
+    k = min(top_k, len(candidates))
+    best = np.argpartition(-fused, k - 1, axis=1)[:, :k]
+    order = np.argsort(-np.take_along_axis(fused, best, axis=1), axis=1, kind="stable")
+    best = np.take_along_axis(best, order, axis=1)
+
+    shortlists = []
+    for row, columns in enumerate(best):
+        shortlist = []
+        for column in columns:
+            if not np.isfinite(fused[row, column]) or fused[row, column] <= 0:
+                continue   # outside the pre-filter, or found by neither source
+            retrieval_scores = {source: float(matrix[row, column]) if found(source, matrix[row, column]) else None
+                                for source, matrix in scores.items()}
+            retrieval_scores["fused"] = float(fused[row, column])
+            retrieval_scores["prescore"] = float(prescores[row, column])
+            doc = candidates[column]
+            shortlist.append(Document(page_content=doc.page_content,
+                                      metadata={**doc.metadata, "retrieval_scores": retrieval_scores}))
+        shortlists.append(shortlist)
+    return shortlists
+
+
+def covers(field_index, ids, mask):
+    # whether the field index holds every candidate some job description still considers
+    return field_index is not None and all(ids[column] in field_index for column in np.flatnonzero(mask.any(axis=0)))
+
+
+@metrics.timed("field_score_matrix")
+def field_score_matrix(field_index, embeddings, job_docs, ids, mask):
+    """
+    Field aware (MULTIVECTOR_MODE) dense scores of every job description against the candidates `ids`,
+    as a (job descriptions x candidates) matrix; only the candidates left in some row of `mask` are
+    scored, the others are -inf (not retrieved).
+    """
+    columns = np.flatnonzero(mask.any(axis=0))
+    scored_ids = [ids[column] for column in columns]
+    matrix = np.full((len(job_docs), len(ids)), -np.inf, dtype=np.float32)
+    for row, job_doc in enumerate(job_docs):
+        matrix[row, columns] = field_index.score(field_index.query_vectors(job_doc, embeddings), scored_ids)
+    return matrix
+
+
+def found(source, score):
+    # same convention as fuse_score_matrices: -inf for dense, 0 for sparse means not retrieved
+    return bool(np.isfinite(score) and (score > 0 if source == "sparse" else True))
@@ -0,0 +1,204 @@
+# persistent bm25 index for the sparse (keyword) retrieval
+
+import json
+import math
+import os
+from collections import Counter
+
+import numpy as np
+
+from src.analyzer import analyze
+from src.metrics import metrics
+from src.vectorstore import content_id
+
+
+def whitespace_tokenizer(text):
+    return text.lower().split()
+
+
+# saved indexes are only reused with the tokenizer they were built with
+def tokenizer_version(tokenizer):
+    return getattr(tokenizer, "version", getattr(tokenizer, "__name__", type(tokenizer).__name__))
+
+
+class SparseIndex:
+    """
+    Incrementally updatable BM25 index over the candidate documents.
+    Postings are kept per term (doc slots + term frequencies), so a query only touches the postings of
+    its own terms and its cost grows with the number of matching candidates, not with the corpus size.
+    Uses the non-negative Lucene idf: log(1 + (N - n + 0.5) / (n + 0.5)).
+    """
+
+    def __init__(self, tokenizer=analyze, k1=1.5, b=0.75):
+        self.tokenizer = tokenizer
+        self.k1 = k1
+        self.b = b
+        self.slots = {}          # doc id -> slot
+        self.doc_ids = []        # slot -> doc id (None once removed)
+        self.doc_terms = []      # slot -> Counter of terms
+        self.lengths = []        # slot -> number of tokens
+        self.postings = {}       # term -> {slot: tf}
+        self.total_length = 0
+        self._arrays = {}        # term -> (slots, tfs) numpy arrays, rebuilt lazily
+        self._length_array = None
+
+    def __len__(self):
+        return len(self.slots)
+
+    def __contains__(self, doc_id):
+        return doc_id in self.slots
+
+    def add(self, doc_id, text):
+        if doc_id in self.slots:
+            self.remove(doc_id)
+        terms = Counter(self.tokenizer(text))
+        self._add_terms(doc_id, terms)
+
+    def _add_terms(self, doc_id, terms):
+        slot = len(self.doc_ids)
+        self.slots[doc_id] = slot
+        self.doc_ids.append(doc_id)
+        self.doc_terms.append(terms)
+        length = sum(terms.values())
+        self.lengths.append(length)
+        self._length_array = None
+        self.total_length += length
+        for term, tf in terms.items():
+            self.postings.setdefault(term, {})[slot] = tf
+            self._arrays.pop(term, None)
+
+    def remove(self, doc_id):
+        slot = self.slots.pop(doc_id, None)
+        if slot is None:
+            return
+        terms = self.doc_terms[slot]
+        for term in terms:
+            posting = self.postings[term]
+            del posting[slot]
+            if not posting:
+                del self.postings[term]
+            self._arrays.pop(term, None)
+        self.total_length -= self.lengths[slot]
+        self.doc_ids[slot] = None
+        self.doc_terms[slot] = Counter()
+        self.lengths[slot] = 0
+        self._length_array = None
+
+    @metrics.timed("bm25_sync")
+    def sync(self, documents, id_key="vector_id", delete_missing=True):
+        """
+        Make the index match `documents`: new ones are tokenized and added, removed ones dropped
+        (unless delete_missing=False), unchanged ones left alone.
+        Returns counts of added, deleted and unchanged documents.
+        """
+        current = {}
+        for doc in documents:
+            current[doc.metadata.get(id_key) or content_id(doc)] = doc.page_content
+        removed = [doc_id for doc_id in self.slots if doc_id not in current] if delete_missing else []
+        for doc_id in removed:
+            self.remove(doc_id)
+        added = [doc_id for doc_id in current if doc_id not in self.slots]
+        for doc_id in added:
+            self.add(doc_id, current[doc_id])
+        if len(self.doc_ids) > 2 * max(1, len(self.slots)):
+            self.compact()
+        return {"added": len(added), "deleted": len(removed), "unchanged": len(current) - len(added)}
+
+    def compact(self):
+        # drop the slots left behind by removed documents
+        live = [(doc_id, terms) for doc_id, terms in zip(self.doc_ids, self.doc_terms) if doc_id is not None]
+        self.__init__(self.tokenizer, self.k1, self.b)
+        for doc_id, terms in live:
+            self._add_terms(doc_id, terms)
+
+    def _posting_arrays(self, term):
+        arrays = self._arrays.get(term)
+        if arrays is None:
+            posting = self.postings[term]
+            arrays = (np.fromiter(posting.keys(), dtype=np.int64, count=len(posting)),
+                      np.fromiter(posting.values(), dtype=np.float32, count=len(posting)))
+            self._arrays[term] = arrays
+        return arrays
+
+    def _term_scores(self, query):
+        # (slots, bm25 contributions) of every query term found in the index, one pair of arrays per term
+        n_docs = len(self.slots)
+        terms = [term for term in self.tokenizer(query) if term in self.postings]
+        if not n_docs or not terms:
+            return []
+        avg_length = self.total_length / n_docs
+        if self._length_array is None:
+            self._length_array = np.asarray(self.lengths, dtype=np.float32)
+        contributions = []
+        for term in terms:
+            slots, tfs = self._posting_arrays(term)
+            idf = math.log(1 + (n_docs - len(slots) + 0.5) / (len(slots) + 0.5))
+            norm = self.k1 * (1 - self.b + self.b * self._length_array[slots] / avg_length)
+            contributions.append((slots, idf * tfs * (self.k1 + 1) / (tfs + norm)))
+        return contributions
+
+    def score(self, query):
+        """Return (doc ids, bm25 scores) of the documents matching at least one query term."""
+        contributions = self._term_scores(query)
+        if not contributions:
+            return [], np.zeros(0, dtype=np.float32)
+        slots, inverse = np.unique(np.concatenate([slots for slots, _ in contributions]), return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate([scores for _, scores in contributions])).astype(np.float32)
+        return [self.doc_ids[slot] for slot in slots], scores
+
+    @metrics.timed("bm25_score_matrix")
+    def score_matrix(self, queries, doc_ids):
+        """
+        BM25 scores of every query against every document of `doc_ids`, as one (queries x doc_ids)
+        float32 matrix (0 where no query term matches, or the document is not indexed).
+        The postings of all the queries are scattered into the matrix with a single bincount.
+        """
+        columns = np.full(len(self.doc_ids), -1, dtype=np.int64)
+        for column, doc_id in enumerate(doc_ids):
+            slot = self.slots.get(doc_id)
+            if slot is not None:
+                columns[slot] = column
+        cells, weights = [], []
+        for row, query in enumerate(queries):
+            for slots, scores in self._term_scores(query):
+                keep = columns[slots] >= 0
+                cells.append(row * len(doc_ids) + columns[slots[keep]])
+                weights.append(scores[keep])
+        size = len(queries) * len(doc_ids)
+        if not cells:
+            return np.zeros((len(queries), len(doc_ids)), dtype=np.float32)
+        matrix = np.bincount(np.concatenate(cells), weights=np.concatenate(weights), minlength=size)
+        return matrix.astype(np.float32).reshape(len(queries), len(doc_ids))
+
+    @metrics.timed("bm25_search")
+    def search(self, query, k=5, allowed_ids=None):
+        """Top k (doc id, score) pairs for the query, best first, optionally restricted to allowed_ids."""
+        doc_ids, scores = self.score(query)
+        if allowed_ids is not None and doc_ids:
+            keep = [i for i, doc_id in enumerate(doc_ids) if doc_id in allowed_ids]
+            doc_ids, scores = [doc_ids[i] for i in keep], scores[keep]
+        if not doc_ids:
+            return []
+        k = min(k, len(doc_ids))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(doc_ids[i], float(scores[i])) for i in top]
+
+    def save(self, path):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        docs = {doc_id: terms for doc_id, terms in zip(self.doc_ids, self.doc_terms) if doc_id is not None}
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"tokenizer": tokenizer_version(self.tokenizer), "k1": self.k1, "b": self.b, "docs": docs}, f)
+
+    @classmethod
+    def load(cls, path, tokenizer=analyze):
+        """Load a saved index, None if it was built with a different tokenizer and has to be rebuilt."""
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("tokenizer") != tokenizer_version(tokenizer):
+            return None
+        index = cls(tokenizer, k1=data["k1"], b=data["b"])
+        for doc_id, terms in data["docs"].items():
+            index._add_terms(doc_id, Counter(terms))
+        return index
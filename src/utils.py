@@ -1,41 +1,109 @@
 # preprocessing the resume (resume cleaning)
 
+import bisect
 import re
+from concurrent.futures import ProcessPoolExecutor
+
+from src import config
+
+
+# patterns compiled once at import instead of on every call
+HTML_TAG = re.compile(r'<[^>]*?>')
+URL = re.compile(
+    r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|'
+    r'(?:%[0-9a-fA-F][0-9a-fA-F]))+'
+)
+EMAIL = re.compile(r'[\w\.-]+@[\w\.-]+')
+EXPERIENCE = re.compile(r'\b\d+(?:[\.-]\d+)?(?:\s*-\s*\d+(?:\.\d+)?)?\s*(?:years?|yrs?)\b', flags=re.IGNORECASE)
+# special characters become a space and runs of spaces collapse to one: a run of two or more special or
+# whitespace characters is one space, a single special character is a space, a single whitespace is kept
+SPECIAL_OR_SPACES = re.compile(r'[^a-zA-Z0-9@.\-_]{2,}|[^a-zA-Z0-9@.\-_\s]')
+EMAIL_MASK = '__EMAIL__'  # word characters only, like the placeholders the emails used to be swapped for
+
+
+def _is_email_char(char):
+    # [\w.-] plus the @ itself
+    return char.isalnum() or char in '_.-@'
+
+
+def _find_emails(text):
+    """
+    Same result as EMAIL.findall(text), without running the pattern over the whole text:
+    an email only spans a run of word characters, dots, dashes and @, so the pattern is only
+    applied to the runs around each @.
+    """
+    emails = []
+    at = text.find('@')
+    while at != -1:
+        start, end = at, at + 1
+        while start > 0 and _is_email_char(text[start - 1]):
+            start -= 1
+        while end < len(text) and _is_email_char(text[end]):
+            end += 1
+        emails.extend(EMAIL.findall(text, start, end))
+        at = text.find('@', end)
+    return emails
+
+
+def _preserve(text, strings, starts, ends):
+    """
+    Mark the occurrences of `strings` in text as preserved, string by string in order and never
+    overlapping an already preserved part, like successive str.replace calls with placeholders would.
+    `starts` / `ends` are the sorted bounds of the preserved parts, updated in place.
+    """
+    for string in dict.fromkeys(strings):
+        found = text.find(string)
+        while found != -1:
+            end = found + len(string)
+            i = bisect.bisect(starts, found)
+            if (i == 0 or ends[i - 1] <= found) and (i == len(starts) or starts[i] >= end):
+                starts.insert(i, found)
+                ends.insert(i, end)
+                found = text.find(string, end)
+            else:
+                found = text.find(string, found + 1)
+
 
 def clean_text(text):
-    # Remove HTML tags
-    text = re.sub(r'<[^>]*?>', '', text)
-    
-    # Remove URLs
-    text = re.sub(
-        r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|'
-        r'(?:%[0-9a-fA-F][0-9a-fA-F]))+',
-        '',
-        text
-    )
-
-    # Preserve emails by temporarily replacing them with placeholders
-    emails = re.findall(r'[\w\.-]+@[\w\.-]+', text)
-    for i, email in enumerate(emails):
-        text = text.replace(email, f"__EMAIL{i}__")
-
-    # Preserve numeric patterns like "2.5 years" or "2-5 years"
-    numbers = re.findall(r'\b\d+(?:[\.-]\d+)?(?:\s*-\s*\d+(?:\.\d+)?)?\s*(?:years?|yrs?)\b', text, flags=re.IGNORECASE)
-    for i, num in enumerate(numbers):
-        text = text.replace(num, f"__NUM{i}__")
-
-    # Remove unwanted special characters (keep . - @ for preserved placeholders)
-    text = re.sub(r'[^a-zA-Z0-9@.\-_\s]', ' ', text)
-
-    # Replace multiple spaces with single space
-    text = re.sub(r'\s{2,}', ' ', text).strip()
-
-    # Restore numeric patterns
-    for i, num in enumerate(numbers):
-        text = text.replace(f"__NUM{i}__", num)
-
-    # Restore emails
-    for i, email in enumerate(emails):
-        text = text.replace(f"__EMAIL{i}__", email)
-
-    return text
\ No newline at end of file
+    """
+    Strip html tags, urls and special characters and collapse whitespace, keeping emails and
+    experience patterns like "2.5 years" or "2-5 years" untouched.
+    The preserved parts are located once and copied as they are, only the text around them is
+    cleaned in one pass, instead of being swapped for placeholders and restored afterwards.
+    """
+    # Remove HTML tags and URLs
+    text = URL.sub('', HTML_TAG.sub('', text))
+
+    # Preserve emails
+    starts, ends = [], []
+    _preserve(text, _find_emails(text), starts, ends)
+
+    # Preserve numeric patterns like "2.5 years" or "2-5 years", looked for with the emails masked out
+    if starts:
+        gaps = zip([0] + ends, starts + [len(text)])
+        masked = EMAIL_MASK.join(text[start:end] for start, end in gaps)
+    else:
+        masked = text
+    _preserve(text, EXPERIENCE.findall(masked), starts, ends)
+
+    # Remove unwanted special characters and replace multiple spaces with single space, around the preserved parts
+    parts = []
+    position = 0
+    for start, end in zip(starts + [len(text)], ends + [len(text)]):
+        parts.append(SPECIAL_OR_SPACES.sub(' ', text[position:start]))
+        parts.append(text[start:end])
+        position = end
+    return ''.join(parts).strip()
+
+
+def clean_texts(texts, cleaner=clean_text, max_workers=None, min_batch=256, chunksize=64):
+    """
+    Clean many texts at once, in order. Batches of at least `min_batch` texts are spread over a
+    process pool of `max_workers` processes (the cleaner has to be a module level function then).
+    """
+    texts = list(texts)
+    max_workers = max_workers or config.CLEAN_TEXT_WORKERS
+    if max_workers <= 1 or len(texts) < min_batch:
+        return [cleaner(text) for text in texts]
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(cleaner, texts, chunksize=chunksize))
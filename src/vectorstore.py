@@ -0,0 +1,302 @@
+# keeping the candidate vector store in sync with the current resume pool
+
+import hashlib
+import json
+import os
+import uuid
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStore
+
+from src.metrics import metrics
+
+try:
+    import faiss  # optional, only used for the ivf index
+except ImportError:
+    faiss = None
+
+
+# metadata keys that do not describe the candidate content itself
+VOLATILE_METADATA = ("id", "vector_id", "text")
+
+
+def content_id(doc):
+    """
+    Deterministic id for a candidate document, derived from its text and metadata.
+    The same resume always maps to the same vector id, a changed resume to a new one.
+    """
+    metadata = {k: v for k, v in doc.metadata.items() if k not in VOLATILE_METADATA}
+    payload = doc.page_content + "\n" + json.dumps(metadata, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+
+
+def stored_ids(vectorstore):
+    # ids currently stored in a local index, a pinecone index (langchain wrapper) or an in-memory store
+    if hasattr(vectorstore, "list_ids"):
+        return vectorstore.list_ids()
+    index = getattr(vectorstore, "_index", None)
+    if index is not None and hasattr(index, "list"):
+        return {vector_id for page in index.list() for vector_id in page}
+    store = getattr(vectorstore, "store", None)
+    if isinstance(store, dict):
+        return set(store)
+    raise TypeError(f"can not list the ids stored in {type(vectorstore).__name__}")
+
+
+def stored_among(vectorstore, ids):
+    # which of `ids` are stored, looked up by id (pinecone fetch in batches) instead of listing the whole index
+    ids = list(ids)
+    if hasattr(vectorstore, "list_ids"):
+        return vectorstore.list_ids() & set(ids)
+    index = getattr(vectorstore, "_index", None)
+    if index is not None and hasattr(index, "fetch"):
+        found = set()
+        for i in range(0, len(ids), 100):
+            found.update(index.fetch(ids=ids[i:i + 100]).vectors)
+        return found
+    return stored_ids(vectorstore) & set(ids)
+
+
+def sync_documents(vectorstore, documents, existing_ids=None, delete_missing=True):
+    """
+    Incrementally upsert candidate documents into the vector store.
+    Only documents whose content id is not stored yet are embedded and added, ids that are stored
+    but no longer part of `documents` are deleted. Every document gets its content id in
+    metadata["vector_id"]. Returns counts of added, deleted and unchanged vectors.
+    With delete_missing=False only the ids of `documents` are looked up in the store, so adding
+    a batch costs the same whatever the size of the index.
+    """
+    documents = list(documents)
+    for doc in documents:
+        doc.metadata["vector_id"] = content_id(doc)
+    if existing_ids is None:
+        existing_ids = stored_ids(vectorstore) if delete_missing \
+            else stored_among(vectorstore, {doc.metadata["vector_id"] for doc in documents})
+    existing_ids = set(existing_ids)
+
+    new_docs, new_ids, current_ids = [], [], set()
+    for doc in documents:
+        vector_id = doc.metadata["vector_id"]
+        if vector_id in current_ids:
+            continue  # same resume uploaded twice
+        current_ids.add(vector_id)
+        if vector_id not in existing_ids:
+            new_docs.append(doc)
+            new_ids.append(vector_id)
+
+    removed_ids = sorted(existing_ids - current_ids) if delete_missing else []
+    if removed_ids:
+        with metrics.stage("vector_delete"):
+            vectorstore.delete(ids=removed_ids)
+    if new_docs:
+        with metrics.stage("vector_upsert"):  # includes embedding the new documents
+            vectorstore.add_texts(
+                [doc.page_content for doc in new_docs],
+                metadatas=[dict(doc.metadata) for doc in new_docs],
+                ids=new_ids,
+            )
+    metrics.incr("vectors_added", len(new_ids))
+    metrics.incr("vectors_deleted", len(removed_ids))
+
+    return {
+        "added": len(new_ids),
+        "deleted": len(removed_ids),
+        "unchanged": len(current_ids) - len(new_ids),
+    }
+
+
+def normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1.0, norms)
+
+
+class LocalVectorStore(VectorStore):
+    """
+    In-process cosine similarity index, an offline alternative to pinecone.
+    Vectors are kept normalized in one float32 matrix, so a search is a single matrix-vector product
+    (index_type="flat", exact). With index_type="ivf" and faiss installed, pools larger than
+    `ivf_min_size` are searched through a faiss IVF index probing `nprobe` lists; a search filtered to
+    fewer than `ivf_min_size` ids stays exact over those ids.
+    The store can be saved to and loaded from a directory.
+    """
+
+    def __init__(self, embedding, index_type="flat", nprobe=8, ivf_min_size=1000):
+        self._embedding = embedding
+        self.index_type = index_type
+        self.nprobe = nprobe
+        self.ivf_min_size = ivf_min_size
+        self.ids = []
+        self.texts = []
+        self.metadatas = []
+        self.vectors = None
+        self._ivf = None
+
+    @property
+    def embeddings(self):
+        return self._embedding
+
+    def __len__(self):
+        return len(self.ids)
+
+    def list_ids(self):
+        return set(self.ids)
+
+    def add_texts(self, texts, metadatas=None, ids=None, **kwargs):
+        texts = list(texts)
+        metadatas = [dict(m) for m in metadatas] if metadatas else [{} for _ in texts]
+        ids = list(ids) if ids else [str(uuid.uuid4()) for _ in texts]
+        vectors = self._embedding.embed_documents(texts)
+        self.add_vectors(vectors, texts, metadatas, ids)
+        return ids
+
+    def add_vectors(self, vectors, texts, metadatas, ids):
+        # already stored ids are replaced
+        stored = set(self.ids)
+        self.delete([i for i in ids if i in stored])
+        vectors = normalize(vectors)
+        self.vectors = vectors if self.vectors is None or not len(self.ids) else np.vstack([self.vectors, vectors])
+        self.ids.extend(ids)
+        self.texts.extend(texts)
+        self.metadatas.extend(metadatas)
+        self._ivf = None
+
+    def delete(self, ids=None, **kwargs):
+        if not ids or not self.ids:
+            return None
+        removed = set(ids)
+        keep = [i for i, vector_id in enumerate(self.ids) if vector_id not in removed]
+        self.vectors = self.vectors[keep]
+        self.ids = [self.ids[i] for i in keep]
+        self.texts = [self.texts[i] for i in keep]
+        self.metadatas = [self.metadatas[i] for i in keep]
+        self._ivf = None
+        return True
+
+    def _search(self, query_vector, k, allowed_ids=None):
+        # positions and cosine similarities of the k nearest vectors
+        if not self.ids:
+            return [], []
+        k = min(k, len(self.ids))
+        query = normalize(query_vector).reshape(1, -1)
+        positions = None
+        if allowed_ids is not None:
+            positions = np.array([i for i, vector_id in enumerate(self.ids) if vector_id in allowed_ids], dtype=np.int64)
+            if not len(positions):
+                return [], []
+        if self.uses_ivf() and (positions is None or len(positions) >= self.ivf_min_size):
+            return self._ivf_search(query, k, positions)
+        if positions is not None:
+            # exact search over the allowed candidates only, cheaper than the ivf for a small filter
+            scores = self.vectors[positions] @ query[0]
+            top = np.argsort(-scores)[:k]
+            return positions[top].tolist(), scores[top].tolist()
+        scores = self.vectors @ query[0]
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return top.tolist(), scores[top].tolist()
+
+    def uses_ivf(self):
+        return self.index_type == "ivf" and faiss is not None and len(self.ids) >= self.ivf_min_size
+
+    def ivf_index(self):
+        # built (trained) on first use after a change, or loaded with the store
+        if self._ivf is None:
+            nlist = max(1, int(np.sqrt(len(self.ids))))
+            quantizer = faiss.IndexFlatIP(self.vectors.shape[1])
+            self._ivf = faiss.IndexIVFFlat(quantizer, self.vectors.shape[1], nlist, faiss.METRIC_INNER_PRODUCT)
+            self._ivf.train(self.vectors)
+            self._ivf.add(self.vectors)
+        return self._ivf
+
+    def _ivf_search(self, query, k, positions=None):
+        """
+        IVF search probing `nprobe` lists, restricted to `positions` when given (a faiss id selector).
+        When the probed lists hold fewer than k (allowed) vectors, twice as many lists are probed,
+        up to all of them (exact).
+        """
+        index = self.ivf_index()
+        k = min(k, len(positions)) if positions is not None else k
+        selector = faiss.IDSelectorBatch(positions) if positions is not None else None
+        nprobe = min(self.nprobe, index.nlist)
+        while True:
+            params = faiss.SearchParametersIVF(sel=selector, nprobe=nprobe) if selector is not None \
+                else faiss.SearchParametersIVF(nprobe=nprobe)
+            scores, found = index.search(query, k, params=params)
+            hits = found[0] >= 0
+            if hits.sum() >= k or nprobe >= index.nlist:
+                return found[0][hits].tolist(), scores[0][hits].tolist()
+            nprobe = min(index.nlist, nprobe * 2)
+            metrics.incr("ivf_reprobes")
+
+    def score_matrix(self, query_vectors, ids):
+        """
+        Cosine similarities of every query vector against the stored vectors of `ids`, as one
+        (queries x ids) matrix product. Ids not in the store get -inf.
+        """
+        rows = {vector_id: row for row, vector_id in enumerate(self.ids)}
+        columns = [column for column, vector_id in enumerate(ids) if vector_id in rows]
+        matrix = np.full((len(query_vectors), len(ids)), -np.inf, dtype=np.float32)
+        if columns and len(query_vectors):
+            stored = self.vectors[[rows[ids[column]] for column in columns]]
+            matrix[:, columns] = normalize(query_vectors) @ stored.T
+        return matrix
+
+    def similarity_search_with_score_by_vector(self, embedding, k=4, filter=None, **kwargs):
+        # filter follows the pinecone syntax, only {"vector_id": {"$in": [...]}} is supported
+        allowed_ids = set(filter["vector_id"]["$in"]) if filter and "vector_id" in filter else None
+        positions, scores = self._search(embedding, k, allowed_ids)
+        return [
+            (Document(page_content=self.texts[p], metadata=dict(self.metadatas[p]), id=self.ids[p]), float(score))
+            for p, score in zip(positions, scores)
+        ]
+
+    def similarity_search_with_score(self, query, k=4, filter=None, **kwargs):
+        return self.similarity_search_with_score_by_vector(self._embedding.embed_query(query), k, filter)
+
+    def similarity_search_by_vector(self, embedding, k=4, filter=None, **kwargs):
+        return [doc for doc, _ in self.similarity_search_with_score_by_vector(embedding, k, filter)]
+
+    def similarity_search(self, query, k=4, filter=None, **kwargs):
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, filter)]
+
+    def _select_relevance_score_fn(self):
+        return lambda score: score  # already a cosine similarity
+
+    @classmethod
+    def from_texts(cls, texts, embedding, metadatas=None, ids=None, **kwargs):
+        store = cls(embedding, **kwargs)
+        store.add_texts(texts, metadatas=metadatas, ids=ids)
+        return store
+
+    def save(self, path):
+        os.makedirs(path, exist_ok=True)
+        vectors = self.vectors if self.vectors is not None else np.zeros((0, 0), dtype=np.float32)
+        np.save(os.path.join(path, "vectors.npy"), vectors)
+        with open(os.path.join(path, "documents.json"), "w", encoding="utf-8") as f:
+            json.dump({"ids": self.ids, "texts": self.texts, "metadatas": self.metadatas}, f)
+        # the trained ivf index is saved too, so a restart does not train it again
+        ivf_path = os.path.join(path, "ivf.index")
+        if self.uses_ivf():
+            faiss.write_index(self.ivf_index(), ivf_path)
+        elif os.path.isfile(ivf_path):
+            os.remove(ivf_path)
+
+    @classmethod
+    def load(cls, path, embedding, **kwargs):
+        store = cls(embedding, **kwargs)
+        with open(os.path.join(path, "documents.json"), encoding="utf-8") as f:
+            data = json.load(f)
+        store.ids, store.texts, store.metadatas = data["ids"], data["texts"], data["metadatas"]
+        store.vectors = np.load(os.path.join(path, "vectors.npy")) if store.ids else None
+        ivf_path = os.path.join(path, "ivf.index")
+        if store.uses_ivf() and os.path.isfile(ivf_path):
+            ivf = faiss.read_index(ivf_path)
+            if ivf.ntotal == len(store.ids) and ivf.d == store.vectors.shape[1]:   # else saved by another version
+                store._ivf = ivf
+        return store
+
+    @classmethod
+    def exists(cls, path):
+        return os.path.isfile(os.path.join(path, "documents.json"))